@@ -29,4 +29,33 @@ def config(filename='database.ini', section='postgresql'):
     else:
         raise Exception('Section {0} not found in the {1} file'.format(section, filename))
 
-    return db
\ No newline at end of file
+    return db
+
+
+# number of token-pair queries the swap sweep keeps in flight; 1 runs the pairs serially
+SWEEP_CONCURRENCY = int(os.getenv("SWEEP_CONCURRENCY", "8"))
+# token-pair sub-queries packed into one aliased request; 1 sends one request per pair
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", "1"))
+# on-disk cache for subgraph responses; set GRAPH_CACHE_DIR="" to disable
+GRAPH_CACHE_DIR = os.getenv("GRAPH_CACHE_DIR", ".graph_cache")
+GRAPH_CACHE_MAX_BYTES = int(os.getenv("GRAPH_CACHE_MAX_BYTES", str(1024 ** 3)))
+# seconds an unpinned (chain head) response stays fresh
+GRAPH_CACHE_HEAD_TTL = int(os.getenv("GRAPH_CACHE_HEAD_TTL", "300"))
+# fetch only rows newer than each stream's stored watermark; 0 re-sweeps from the start block
+SWEEP_INCREMENTAL = os.getenv("SWEEP_INCREMENTAL", "1") == "1"
+# pickled deployment registries, one per deployment.json path and mtime
+SUBGRAPHS_SNAPSHOT_DIR = os.getenv("SUBGRAPHS_SNAPSHOT_DIR", os.path.join(".graph_cache", "snapshots"))
+# send catalog queries as sha256 hashes (automatic persisted queries); The Graph does not support them
+GRAPH_PERSISTED_QUERIES = os.getenv("GRAPH_PERSISTED_QUERIES", "0") == "1"
+# local liquidity-pool index per subgraph deployment, refreshed incrementally
+POOL_INDEX_DIR = os.getenv("POOL_INDEX_DIR", os.path.join(".graph_cache", "pools"))
+# fetch swaps for all token pairs in one stream and split them by pair locally; opt-in
+SWEEP_SINGLE_STREAM = os.getenv("SWEEP_SINGLE_STREAM", "0") == "1"
+# rows per COPY/commit when bulk loading into Postgres
+COPY_BATCH_SIZE = int(os.getenv("COPY_BATCH_SIZE", "10000"))
+# shared Postgres connection pool: sizes, and idle seconds before a connection is pinged on checkout
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "8"))
+DB_POOL_CHECK_AFTER = int(os.getenv("DB_POOL_CHECK_AFTER", "30"))
+# rows per CSV chunk when streaming transform inputs
+STREAM_ITERSIZE = int(os.getenv("STREAM_ITERSIZE", "5000"))
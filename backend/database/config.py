@@ -7,8 +7,15 @@ import psycopg2
 from configparser import ConfigParser
 import sys
 
-print("path",os.getcwd())
-def make_conn(filename='/Users/corneliaweinzierl/Connectr/backend/database/database.ini', section='postgresql'):
+# DATABASE_URL wins; otherwise the [postgresql] section of DATABASE_INI (default: database.ini next to this file)
+DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_INI = os.getenv("DATABASE_INI", os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.ini"))
+
+
+def connection_params(filename=None, section='postgresql'):
+    if DATABASE_URL and filename is None:
+        return {"dsn": DATABASE_URL}
+    filename = filename or DATABASE_INI
     # create a parser
     parser = ConfigParser()
     # read config file
@@ -22,5 +29,9 @@ def make_conn(filename='/Users/corneliaweinzierl/Connectr/backend/database/datab
             db[param[0]] = param[1]
     else:
         raise Exception('Section {0} not found in the {1} file'.format(section, filename))
-    connection = psycopg2.connect(**db)
-    return connection
\ No newline at end of file
+    return db
+
+
+def make_conn(filename=None, section='postgresql'):
+    connection = psycopg2.connect(**connection_params(filename, section))
+    return connection
@@ -0,0 +1,88 @@
+from backend.database.pool import get_pool
+from backend.database.schema import ensure_table
+
+# product enum -> raw table its swaps are loaded into
+PRODUCT_TABLES = {
+    "PANCAKESWAP": "raw_graph_data_pancakeswap",
+    "UNISWAP_V3": "raw_graph_data_uniswap",
+}
+
+# field enum -> aggregate over the swap_rollups rows of one (block, tokenin, tokenout) group
+ROLLUP_AGGREGATES = {
+    "COUNT_SWAPS": "SUM(swap_count)",
+    "SUM_SWAPS_TOKEN_1": "SUM(amountinusd_sum)",
+}
+
+DATA_POINTS_TABLE = "data_points"
+ROLLUP_TABLE = "swap_rollups"
+
+
+def metric_sql(product, field, source="SUBGRAPH", min_block=None, table=DATA_POINTS_TABLE):
+    """(delete, insert, params) that rebuild one product/field metric from swap_rollups."""
+    if product not in PRODUCT_TABLES or field not in ROLLUP_AGGREGATES:
+        raise NotImplementedError(f"no metric for product {product} and field {field}")
+    # data_points.block is a string column
+    block_filter = "" if min_block is None else "AND block::bigint >= %(min_block)s"
+    # rows left without a timestamp by the typed-column migration cannot become data points
+    filters = ["product = %(product)s", "timestamp IS NOT NULL"]
+    if min_block is not None:
+        filters.append("blocknumber >= %(min_block)s")
+    delete = f"""DELETE FROM {table}
+    WHERE product_name_enum = %(product)s AND field_name_enum = %(field)s {block_filter}"""
+    # data_points.timestamp is a string column too: always write it as UTC "YYYY-MM-DD HH24:MI:SS",
+    # whatever the session time zone
+    insert = f"""INSERT INTO {table}
+        (id, block, timestamp, value, source_name_enum, product_name_enum, field_name_enum, token1, token2, token3, token4)
+    SELECT gen_random_uuid(), blocknumber, to_char(MAX(timestamp) AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS'),
+           {ROLLUP_AGGREGATES[field]}, %(source)s, %(product)s, %(field)s, tokenin, tokenout, NULL, NULL
+    FROM {ROLLUP_TABLE}
+    WHERE {" AND ".join(filters)}
+    GROUP BY blocknumber, tokenin, tokenout"""
+    params = {"product": product, "field": field, "source": source, "min_block": min_block}
+    return delete, insert, params
+
+
+def write_metric(cursor, product, field, source="SUBGRAPH", min_block=None):
+    delete, insert, params = metric_sql(product, field, source, min_block)
+    cursor.execute(delete, params)
+    replaced = cursor.rowcount
+    cursor.execute(insert, params)
+    return replaced, cursor.rowcount
+
+
+def refresh_metric(product, field, source="SUBGRAPH", pool=None):
+    """Rewrite a metric's data points from the lowest block whose rollups changed since its last refresh.
+
+    Each metric keeps its own refresh time, so any number of metrics can
+    follow one refresh_rollups run. Rollup writers are held off while the
+    new refresh time is taken, so none can land just behind it.
+    """
+    ensure_table("swap_rollups", ROLLUP_TABLE, pool)
+    with (pool or get_pool()).connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {ROLLUP_TABLE} IN SHARE MODE")
+            cursor.execute(
+                f"SELECT refreshed_at FROM {ROLLUP_TABLE}_metric_progress WHERE product = %s AND field = %s",
+                (product, field),
+            )
+            row = cursor.fetchone()
+            cursor.execute(
+                f"""SELECT clock_timestamp(), MIN(blocknumber) FROM {ROLLUP_TABLE}
+                WHERE product = %s AND (%s::timestamptz IS NULL OR updated_at > %s)""",
+                (product, row[0] if row else None, row[0] if row else None),
+            )
+            refreshed_at, min_block = cursor.fetchone()
+            if min_block is None:
+                conn.rollback()
+                print(f"{product} {field}: data points up to date")
+                return 0
+            replaced, written = write_metric(cursor, product, field, source, min_block)
+            cursor.execute(
+                f"""INSERT INTO {ROLLUP_TABLE}_metric_progress (product, field, refreshed_at) VALUES (%s, %s, %s)
+                ON CONFLICT (product, field) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at""",
+                (product, field, refreshed_at),
+            )
+        conn.commit()
+    print(f"{product} {field}: {written} data points from block {min_block} ({replaced} replaced)")
+    return written
+
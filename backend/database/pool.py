@@ -0,0 +1,100 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+from backend.config import DB_POOL_CHECK_AFTER, DB_POOL_MAX, DB_POOL_MIN
+from backend.database import config
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool, opened on first checkout.
+
+    Each worker checks out its own connection with `connection()`; when all
+    `maxconn` are in use the checkout waits instead of failing. Connections
+    idle for longer than `check_after` seconds are pinged before reuse and
+    replaced if the server dropped them.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, check_after=DB_POOL_CHECK_AFTER, **params):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.check_after = check_after
+        self.params = params
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.last_used = {}
+        self._pool = None
+
+    @property
+    def pool(self):
+        with self.lock:
+            if self._pool is None:
+                params = self.params or config.connection_params()
+                self._pool = pg_pool.ThreadedConnectionPool(self.minconn, self.maxconn, **params)
+            return self._pool
+
+    def healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - self.last_used.get(id(conn), 0) < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        pool = self.pool
+        while True:
+            conn = pool.getconn()
+            if self.healthy(conn):
+                return conn
+            print("dropping a dead database connection")
+            self.last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of the block; rolled back on error."""
+        self.slots.acquire()
+        try:
+            conn = self.getconn()
+            try:
+                yield conn
+            except Exception:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+                raise
+            finally:
+                self.last_used[id(conn)] = time.monotonic()
+                self.pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self.slots.release()
+
+    def close(self):
+        with self.lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self.last_used.clear()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool every reader and writer shares."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
@@ -0,0 +1,66 @@
+from backend.database.metrics import PRODUCT_TABLES
+from backend.database.pool import get_pool
+from backend.database.schema import ensure_table
+
+ROLLUP_TABLE = "swap_rollups"
+
+
+def rollup_sql(raw_table, table=ROLLUP_TABLE):
+    # recompute only the (source, tokenin, tokenout, blocknumber) groups touched by new raw rows
+    # (raw swap rows are insert-only: upsert_data skips keys already stored, so a new id is the only change)
+    return f"""WITH touched AS (
+        SELECT DISTINCT COALESCE(source, '') AS source, tokenin, tokenout, blocknumber
+        FROM {raw_table}
+        WHERE id > %(last_id)s AND id <= %(max_id)s
+          AND tokenin IS NOT NULL AND tokenout IS NOT NULL AND blocknumber IS NOT NULL
+    )
+    INSERT INTO {table} AS r
+        (product, source, tokenin, tokenout, blocknumber, timestamp, swap_count, amountinusd_sum)
+    SELECT %(product)s, t.source, s.tokenin, s.tokenout, s.blocknumber,
+           MAX(s.timestamp), COUNT(*), SUM(s.amountinusd)
+    FROM touched t
+    JOIN {raw_table} s
+      ON s.tokenin = t.tokenin AND s.tokenout = t.tokenout AND s.blocknumber = t.blocknumber
+     AND COALESCE(s.source, '') = t.source
+    GROUP BY t.source, s.tokenin, s.tokenout, s.blocknumber
+    ON CONFLICT (product, source, tokenin, tokenout, blocknumber) DO UPDATE
+    SET timestamp = EXCLUDED.timestamp,
+        swap_count = EXCLUDED.swap_count,
+        amountinusd_sum = EXCLUDED.amountinusd_sum,
+        -- wall clock, not transaction start, so metric refreshes can compare against it
+        updated_at = clock_timestamp()"""
+
+
+def refresh_rollups(product, pool=None, table=ROLLUP_TABLE):
+    """Fold raw swaps loaded since the last refresh into per-block rollups of `product`.
+
+    Progress is the highest raw `id` folded in, so late rows for old blocks
+    (backfills, slower pairs) are still picked up; each touched group is
+    recomputed whole. The raw table is share-locked while the new id range
+    is read, so no in-flight load can commit an id below it afterwards.
+    Returns the number of rollup groups rewritten.
+    """
+    raw_table = PRODUCT_TABLES[product]
+    ensure_table("swap_rollups", table, pool)
+    with (pool or get_pool()).connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {raw_table} IN SHARE MODE")
+            cursor.execute(f"SELECT last_id FROM {table}_progress WHERE product = %s", (product,))
+            row = cursor.fetchone()
+            last_id = row[0] if row else 0
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {raw_table}")
+            max_id = cursor.fetchone()[0]
+            if max_id <= last_id:
+                conn.rollback()
+                print(f"{product} rollups up to date at raw id {last_id}")
+                return 0
+            cursor.execute(rollup_sql(raw_table, table), {"product": product, "last_id": last_id, "max_id": max_id})
+            groups = cursor.rowcount
+            cursor.execute(
+                f"""INSERT INTO {table}_progress (product, raw_table, last_id) VALUES (%s, %s, %s)
+                ON CONFLICT (product) DO UPDATE SET last_id = EXCLUDED.last_id, raw_table = EXCLUDED.raw_table, updated_at = now()""",
+                (product, raw_table, max_id),
+            )
+        conn.commit()
+    print(f"{product}: folded raw ids ({last_id}, {max_id}] into {groups} rollup groups")
+    return groups
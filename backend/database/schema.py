@@ -0,0 +1,180 @@
+import threading
+
+from backend.database.pool import get_pool
+
+schema_versions_structure = """table_name VARCHAR(255) PRIMARY KEY,
+    kind VARCHAR(255) NOT NULL,
+    version INTEGER NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()"""
+
+# the untyped layout raw swap tables were created with before versioning
+legacy_swap_table_structure = """id SERIAL PRIMARY KEY,
+    timestamp VARCHAR(255),
+    blocknumber TEXT,
+    hash VARCHAR(255),
+    logindex VARCHAR(255),
+    tokenin TEXT,
+    tokenout TEXT,
+    amountout VARCHAR(255),
+    amountoutusd VARCHAR(255),
+    amountin VARCHAR(255),
+    amountinusd VARCHAR(255),
+    source VARCHAR(255)"""
+
+swap_table_structure = """id SERIAL PRIMARY KEY,
+    timestamp TIMESTAMPTZ,
+    blocknumber BIGINT,
+    hash VARCHAR(255),
+    logindex INTEGER,
+    tokenin TEXT,
+    tokenout TEXT,
+    amountout NUMERIC,
+    amountoutusd NUMERIC,
+    amountin NUMERIC,
+    amountinusd NUMERIC,
+    source VARCHAR(255),
+    chain VARCHAR(255)"""
+
+swap_rollup_table_structure = """product VARCHAR(255) NOT NULL,
+    source VARCHAR(255) NOT NULL,
+    tokenin TEXT NOT NULL,
+    tokenout TEXT NOT NULL,
+    blocknumber BIGINT NOT NULL,
+    timestamp TIMESTAMPTZ,
+    swap_count BIGINT NOT NULL,
+    amountinusd_sum NUMERIC,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+    PRIMARY KEY (product, source, tokenin, tokenout, blocknumber)"""
+
+rollup_progress_structure = """product VARCHAR(255) PRIMARY KEY,
+    raw_table VARCHAR(255) NOT NULL,
+    last_id BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()"""
+
+
+metric_progress_structure = """product VARCHAR(255) NOT NULL,
+    field VARCHAR(255) NOT NULL,
+    refreshed_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (product, field)"""
+
+
+def numeric(column, cast):
+    # legacy rows hold 'None'/'nan' and other junk next to real numbers
+    value = f"{column}::numeric" if cast == "numeric" else f"{column}::numeric::{cast}"
+    return f"CASE WHEN {column} ~ '^-?[0-9]+(\\.[0-9]+)?([eE][-+]?[0-9]+)?$' THEN {value} END"
+
+
+def column_types(cursor, table):
+    cursor.execute(
+        """SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s""",
+        (table,),
+    )
+    return dict(cursor.fetchall())
+
+
+def typed_swap_columns(table, cursor):
+    # column -> (information_schema data_type, clause converting it from the legacy text layout)
+    typed = {
+        "timestamp": ("timestamp with time zone", """ALTER COLUMN timestamp TYPE TIMESTAMPTZ USING
+            CASE WHEN "timestamp" ~ '^[0-9]+$' THEN to_timestamp("timestamp"::bigint)
+                 WHEN "timestamp" IN ('', 'None', 'nan') THEN NULL
+                 ELSE "timestamp"::timestamptz END"""),
+        "blocknumber": ("bigint", f"ALTER COLUMN blocknumber TYPE BIGINT USING {numeric('blocknumber', 'bigint')}"),
+        "logindex": ("integer", """ALTER COLUMN logindex TYPE INTEGER USING
+            CASE WHEN logindex ~ '^[0-9]+$' THEN logindex::integer
+                 -- the old row-by-row insert wrapped ints in to_timestamp()
+                 WHEN logindex ~ '^1970-01-01' THEN extract(epoch FROM logindex::timestamptz)::integer END"""),
+    }
+    for column in ("amountout", "amountoutusd", "amountin", "amountinusd"):
+        typed[column] = ("numeric", f"ALTER COLUMN {column} TYPE NUMERIC USING {numeric(column, 'numeric')}")
+    # a table created with the typed layout outside ensure_table has nothing to convert
+    current = column_types(cursor, table)
+    clauses = [clause for column, (data_type, clause) in typed.items() if current.get(column) != data_type]
+    if not clauses:
+        return []
+    return [f"ALTER TABLE {table}\n        " + ",\n        ".join(clauses)]
+
+
+def swap_indexes(table, cursor):
+    return [
+        f"CREATE INDEX IF NOT EXISTS {table}_pair_block_idx ON {table} (tokenin, tokenout, blocknumber)",
+        f"CREATE INDEX IF NOT EXISTS {table}_hash_logindex_idx ON {table} (hash, logindex)",
+    ]
+
+
+def natural_key(table, cursor):
+    # drop rows loaded more than once before the key existed, keeping the first copy
+    return [
+        f"""DELETE FROM {table} a USING {table} b
+        WHERE a.hash = b.hash AND a.logindex = b.logindex AND a.id > b.id""",
+        f"DROP INDEX IF EXISTS {table}_hash_logindex_idx",
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_hash_logindex_key ON {table} (hash, logindex)",
+    ]
+
+
+# kind -> ordered migrations; each takes the table name and the migrating cursor
+# (to inspect the table as it stands) and returns its statements.
+# Only ever append: a table at version N gets migrations N+1.. applied.
+MIGRATIONS = {
+    "swaps": [
+        lambda table, cursor: [
+            f"CREATE TABLE IF NOT EXISTS {table}( {legacy_swap_table_structure})",
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS chain VARCHAR(255)",
+        ],
+        typed_swap_columns,
+        swap_indexes,
+        natural_key,
+    ],
+    "swap_rollups": [
+        lambda table, cursor: [
+            f"CREATE TABLE IF NOT EXISTS {table}( {swap_rollup_table_structure})",
+            f"CREATE TABLE IF NOT EXISTS {table}_progress( {rollup_progress_structure})",
+            f"CREATE TABLE IF NOT EXISTS {table}_metric_progress( {metric_progress_structure})",
+            f"CREATE INDEX IF NOT EXISTS {table}_product_block_idx ON {table} (product, blocknumber)",
+            f"CREATE INDEX IF NOT EXISTS {table}_product_updated_idx ON {table} (product, updated_at)",
+        ],
+    ],
+}
+
+_ensured = set()
+_ensured_lock = threading.Lock()
+
+
+def schema_version(cursor, table):
+    cursor.execute("SELECT version FROM schema_versions WHERE table_name = %s", (table,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def ensure_table(kind, table, pool=None):
+    """Create or migrate `table` to the latest schema of `kind` (a key of MIGRATIONS).
+
+    Pending migrations run in one transaction under an advisory lock, so
+    concurrent workers never migrate the same table twice. Checked once
+    per table per process.
+    """
+    if (kind, table) in _ensured:
+        return
+    migrations = MIGRATIONS[kind]
+    with (pool or get_pool()).connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS schema_versions( {schema_versions_structure})")
+            conn.commit()
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (table,))
+            # naive timestamps in legacy rows were written as UTC
+            cursor.execute("SET LOCAL TIME ZONE 'UTC'")
+            version = schema_version(cursor, table)
+            for number, migration in enumerate(migrations[version:], start=version + 1):
+                print(f"migrating {table} ({kind}) to version {number}")
+                for statement in migration(table, cursor):
+                    cursor.execute(statement)
+            if version < len(migrations):
+                cursor.execute(
+                    """INSERT INTO schema_versions (table_name, kind, version) VALUES (%s, %s, %s)
+                    ON CONFLICT (table_name) DO UPDATE SET version = EXCLUDED.version, updated_at = now()""",
+                    (table, kind, len(migrations)),
+                )
+        conn.commit()
+    with _ensured_lock:
+        _ensured.add((kind, table))
@@ -1,16 +1,19 @@
+import io
+import itertools
+import json
+import math
 import sqlalchemy
+import pandas as pd
 import psycopg2
 import psycopg2.extras
 import os
 # import sys
 # print('path', sys.path)
 from ..database import config
+from backend.config import COPY_BATCH_SIZE
+from backend.database.pool import get_pool
 # import config
 
-#pull in config params
-conn = config.make_conn()
-# conn = psycopg2.connect(config)
-cursor = conn.cursor()
 def insert_row_data(data_to_insert, table, table_structure):
     keys = ', '.join([f'"{k}"' for k in data_to_insert.keys()])
     # print('keys', keys)
@@ -28,21 +31,125 @@ def insert_row_data(data_to_insert, table, table_structure):
     create_table_statement = f"""
     CREATE TABLE IF NOT EXISTS {table}( {table_structure})
     """
-    cursor.execute(create_table_statement)
-
     insert_statement = f"""
     INSERT INTO {table} ({keys})
     VALUES ({values})
     """
 
     print('insert statement', insert_statement)
-    # Execute the insert statement
-    cursor.execute(insert_statement)
-    # Commit the transaction
-    conn.commit()
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(create_table_statement)
+            # Execute the insert statement
+            cursor.execute(insert_statement)
+        # Commit the transaction
+        conn.commit()
     # Close the connection
     # cursor.close()
     # conn.close()
+def copy_value(v):
+    # same mapping as insert_row_data, minus the string building
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return None
+    if isinstance(v, dict):
+        return v.get('symbol')
+    if isinstance(v, (list, tuple)):
+        return json.dumps(v)
+    return v
+
+
+def iter_records(data):
+    if isinstance(data, pd.DataFrame):
+        # object dtype keeps ints as ints instead of upcasting mixed rows to float
+        return (dict(zip(data.columns, row)) for row in data.astype(object).itertuples(index=False, name=None))
+    return iter(data)
+
+
+def csv_field(v):
+    # strings are always quoted, so an unquoted empty field is the only NULL
+    v = copy_value(v)
+    if v is None:
+        return ''
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return str(v)
+    return '"' + str(v).replace('"', '""') + '"'
+
+
+def copy_batch(cur, table, columns, records):
+    buf = io.StringIO()
+    for record in records:
+        buf.write(','.join([csv_field(record.get(c)) for c in columns]))
+        buf.write('\n')
+    buf.seek(0)
+    keys = ', '.join([f'"{c}"' for c in columns])
+    # timestamps are formatted as naive UTC
+    cur.execute("SET LOCAL TIME ZONE 'UTC'")
+    cur.copy_expert(f"COPY {table} ({keys}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def dedupe(records, key):
+    """Keep the last record per natural key; records missing part of the key pass through."""
+    unique = {}
+    keyless = []
+    for record in records:
+        values = tuple(copy_value(record.get(k)) for k in key)
+        if any(v is None for v in values):
+            keyless.append(record)
+        else:
+            unique[values] = record
+    return list(unique.values()) + keyless
+
+
+def upsert_batch(cur, table, columns, records, key):
+    # COPY into a staging table, then let the natural-key unique index drop duplicates
+    staging = f"{table}_staging"
+    keys = ', '.join([f'"{c}"' for c in columns])
+    cur.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {keys} FROM {table} WITH NO DATA")
+    copy_batch(cur, staging, columns, records)
+    conflict = ', '.join([f'"{k}"' for k in key])
+    cur.execute(f"INSERT INTO {table} ({keys}) SELECT {keys} FROM {staging} ON CONFLICT ({conflict}) DO NOTHING")
+    return cur.rowcount
+
+
+def copy_rows(data, table, table_structure, batch_size=COPY_BATCH_SIZE, key=None):
+    """Bulk load a DataFrame or an iterable of dicts with COPY ... FROM STDIN.
+
+    The table is created once per call (unless `table_structure` is None)
+    and every `batch_size` rows go in one COPY and one commit, instead of
+    three statements and a commit per row. Columns are taken from the
+    DataFrame or the first record.
+
+    With `key` (columns of a unique index, e.g. ("hash", "logindex")) the
+    load is idempotent: each batch is deduplicated in memory and rows that
+    already exist are skipped. Stored rows are never rewritten, since the
+    swap rollups only fold in rows with a new id.
+    """
+    records = iter_records(data)
+    first = next(records, None)
+    if first is None:
+        return 0
+    columns = list(first.keys())
+    records = itertools.chain([first], records)
+    loaded = 0
+    # one pooled connection per call, so concurrent workers load in parallel
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        if table_structure is not None:
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {table}( {table_structure})")
+            conn.commit()
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            if key:
+                loaded += upsert_batch(cur, table, columns, dedupe(batch, key), key)
+            else:
+                copy_batch(cur, table, columns, batch)
+                loaded += len(batch)
+            conn.commit()
+    print(f'copied {loaded} rows into {table}')
+    return loaded
+
+
 class DbService:
     
     def __init__(self, data_to_insert, table,table_structure):
@@ -55,12 +162,11 @@ class DbService:
     def insert_data(dataframe, table, table_structure):
         # print('dataframe', dataframe)
         # dataframe.columns = map(str.lower, dataframe.columns)
+        return copy_rows(dataframe, table, table_structure)
 
-        for index, row in dataframe.iterrows():
-            
-            #   print('index', index)
-            #   print('row', row)
-              insert_row_data(row.to_dict(),table,table_structure)
+    def upsert_data(dataframe, table, table_structure, key=('hash', 'logindex')):
+        # safe to re-run: rows already loaded under the same natural key are skipped
+        return copy_rows(dataframe, table, table_structure, key=key)
 # try:
 #     # Connect to your postgres DB
 #     conn = config.make_conn()
@@ -0,0 +1,17 @@
+import itertools
+
+from backend.database.send_data import copy_rows
+
+
+def transform_stream(chunks, transform, write):
+    """Run every chunk through `transform(rows) -> records` and hand the records to `write`.
+
+    `write` receives one lazy iterator over all records, so a COPY-based
+    writer streams them in its own batches without collecting them.
+    """
+    return write(itertools.chain.from_iterable(transform(chunk) for chunk in chunks))
+
+
+def data_points_writer(table="data_points"):
+    # the table is managed elsewhere, so no structure to create it with
+    return lambda records: copy_rows(records, table, None)
@@ -0,0 +1,64 @@
+from collections import namedtuple
+
+from backend.database.pool import get_pool
+
+# last fully ingested block of one (protocol, chain, stream, entity) stream;
+# hash/log_index are only set on rows written by the old per-row format
+Watermark = namedtuple("Watermark", ["block_number", "hash", "log_index"])
+
+watermark_table_structure = """protocol VARCHAR(255) NOT NULL,
+    chain VARCHAR(255) NOT NULL,
+    stream VARCHAR(255) NOT NULL,
+    entity VARCHAR(255) NOT NULL,
+    block_number BIGINT NOT NULL,
+    hash VARCHAR(255),
+    log_index INTEGER,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (protocol, chain, stream, entity)"""
+
+
+def newer_than(rows, watermark):
+    """Drop rows of blocks a complete-block watermark already covers."""
+    if watermark is None or watermark.log_index is not None:
+        # no watermark, or one from the old per-row format whose block may be partial
+        return list(rows)
+    return [row for row in rows if int(row["blockNumber"]) > watermark.block_number]
+
+
+class WatermarkStore:
+    def __init__(self, pool=None, table="ingest_watermarks"):
+        self.pool = pool or get_pool()
+        self.table = table
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {self.table}( {watermark_table_structure})")
+            conn.commit()
+
+    def get(self, protocol, chain, stream, entity):
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                f"""SELECT block_number, hash, log_index FROM {self.table}
+                WHERE protocol = %s AND chain = %s AND stream = %s AND entity = %s""",
+                (protocol, chain, stream, entity),
+            )
+            row = cursor.fetchone()
+        return Watermark(*row) if row else None
+
+    def advance(self, protocol, chain, stream, entity, block_number):
+        """Record every block up to `block_number` as fully ingested; it never moves backwards."""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"""INSERT INTO {self.table} AS w (protocol, chain, stream, entity, block_number, hash, log_index)
+                    VALUES (%s, %s, %s, %s, %s, NULL, NULL)
+                    ON CONFLICT (protocol, chain, stream, entity) DO UPDATE
+                    SET block_number = EXCLUDED.block_number,
+                        hash = NULL,
+                        log_index = NULL,
+                        updated_at = now()
+                    WHERE w.block_number < EXCLUDED.block_number
+                       OR (w.block_number = EXCLUDED.block_number AND w.log_index IS NOT NULL)""",
+                    (protocol, chain, stream, entity, block_number),
+                )
+            conn.commit()
+        return Watermark(block_number, None, None)
@@ -0,0 +1,142 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_SHARD_SIZE = 50000
+DEFAULT_WORKERS = 4
+JOURNAL_DIR = "backfill_journals"
+
+
+def plan_shards(start_block, end_block, shard_size=DEFAULT_SHARD_SIZE):
+    """Split [start_block, end_block) into consecutive half-open block ranges."""
+    if end_block <= start_block:
+        raise ValueError(f"empty block range [{start_block}, {end_block})")
+    if shard_size < 1:
+        raise ValueError("shard_size must be positive")
+    return [
+        (lo, min(lo + shard_size, end_block))
+        for lo in range(start_block, end_block, shard_size)
+    ]
+
+
+class BackfillJournal:
+    """Append-only JSON-lines record of finished shards, so a rerun skips them."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # torn last line from a crash mid-write
+                        continue
+                    self.done.add((entry["start"], entry["end"]))
+
+    def is_done(self, shard):
+        return tuple(shard) in self.done
+
+    def mark_done(self, shard, rows):
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"start": shard[0], "end": shard[1], "rows": rows}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.done.add(tuple(shard))
+
+
+def journal_path_for(graph_service, entity, start_block, end_block):
+    subgraph = graph_service.subgraph
+    name = f"{subgraph.protocol}_{subgraph.chain}_{entity}_{start_block}_{end_block}.jsonl"
+    return os.path.join(JOURNAL_DIR, name)
+
+
+def run_backfill(
+    graph_service,
+    entity,
+    fields,
+    start_block,
+    end_block,
+    sink,
+    where=None,
+    shard_size=DEFAULT_SHARD_SIZE,
+    workers=DEFAULT_WORKERS,
+    journal_path=None,
+    pin_blocks=True,
+    serialize_sink=True,
+):
+    """Backfill `entity` over [start_block, end_block) with shards fetched in parallel.
+
+    Each shard pages through its block range with GraphService.paginate and
+    passes every page to `sink(page)`; sink calls are serialized unless
+    `serialize_sink` is off, e.g. for a sink backed by the connection pool. A shard is journaled only once all
+    of its pages were sunk, so rerunning after a crash picks up the
+    unfinished shards only.
+
+    With `pin_blocks` each shard is queried at `block: {number: end - 1}`;
+    the result can then never change and stays in the query cache for good,
+    so `end_block` must already be indexed by the subgraph.
+    """
+    if journal_path is None:
+        journal_path = journal_path_for(graph_service, entity, start_block, end_block)
+    journal = BackfillJournal(journal_path)
+    shards = [s for s in plan_shards(start_block, end_block, shard_size) if not journal.is_done(s)]
+    print(f"backfill {entity} [{start_block}, {end_block}): {len(shards)} shards left, journal {journal_path}")
+    sink_lock = threading.Lock() if serialize_sink else contextlib.nullcontext()
+
+    def load_shard(shard):
+        lo, hi = shard
+        shard_where = dict(where or {}, blockNumber_gte=lo, blockNumber_lt=hi)
+        rows = 0
+        block = hi - 1 if pin_blocks else None
+        for page in graph_service.paginate(entity, fields, where=shard_where, cursor="blockNumber", block=block):
+            with sink_lock:
+                sink(page)
+            rows += len(page)
+        journal.mark_done(shard, rows)
+        return rows
+
+    loaded = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(load_shard, shard): shard for shard in shards}
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                rows = future.result()
+            except Exception as e:
+                print(f"Error while backfilling shard {shard}: {e}")
+                failed.append(shard)
+                continue
+            loaded += rows
+            print(f"shard {shard} done: {rows} rows")
+    return {"rows": loaded, "failed": sorted(failed)}
+
+
+if __name__ == "__main__":
+    # python -m backend.services.graph.backfill <protocol> <start_block> <end_block>
+    from backend.services.graph.queries import swap_fields
+    from backend.services.graph.service import GraphService, write_swaps
+
+    protocol, start_block, end_block = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+    graph_service = GraphService(protocol=protocol, chain="ethereum")
+    summary = run_backfill(
+        graph_service,
+        "swaps",
+        swap_fields,
+        start_block,
+        end_block,
+        lambda page: write_swaps(None, page, source=protocol, table=f"raw_graph_data_{protocol.split('-')[0]}"),
+        # write_swaps checks out its own pooled connection
+        serialize_sink=False,
+    )
+    print("backfill summary", summary)
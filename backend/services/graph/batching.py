@@ -0,0 +1,92 @@
+import re
+
+from backend.services.graph.gql import collection_field
+from backend.services.graph.queries import DEFAULT_START_BLOCK
+
+# pair sub-queries packed into one GraphQL document
+DEFAULT_BATCH_SIZE = 15
+# rows requested per alias; graph-node caps `first` at 1000
+DEFAULT_ALIAS_FIRST = 1000
+
+
+def pair_alias(token1, token2, taken=()):
+    """A valid, unique GraphQL alias for a pair, e.g. p_DAI_USDC."""
+    base = re.sub(r"\W", "_", f"p_{token1}_{token2}")
+    alias = base
+    n = 1
+    while alias in taken:
+        n += 1
+        alias = f"{base}_{n}"
+    return alias
+
+
+def swap_pair_where(token1, token2, start_block=DEFAULT_START_BLOCK):
+    # same filter as service.query_template, as a where literal
+    return {
+        "and": [
+            {"tokenIn_": {"symbol": token1}},
+            {"tokenOut_": {"symbol": token2}},
+            {"blockNumber_gt": start_block},
+        ]
+    }
+
+
+def build_pair_batch(pairs, entity, fields, where_for_pair, first=DEFAULT_ALIAS_FIRST):
+    """Pack one aliased `entity` sub-query per pair into a single document.
+
+    Returns the query text and the alias -> pair mapping needed to split the
+    response back out.
+    """
+    aliases = {}
+    parts = []
+    for token1, token2 in pairs:
+        alias = pair_alias(token1, token2, aliases)
+        aliases[alias] = (token1, token2)
+        parts.append(
+            collection_field(
+                entity,
+                fields,
+                first=first,
+                where=where_for_pair(token1, token2),
+                alias=alias,
+            )
+        )
+    return "{\n" + "\n".join(parts) + "\n}", aliases
+
+
+def query_pairs_batched(
+    graph_service,
+    pairs,
+    entity,
+    fields,
+    where_for_pair=swap_pair_where,
+    batch_size=DEFAULT_BATCH_SIZE,
+    first=DEFAULT_ALIAS_FIRST,
+):
+    """Yield (pair, rows) for every pair, sending one request per `batch_size` pairs.
+
+    A pair that fills its `first` rows is fetched again with
+    GraphService.paginate, so no pair is truncated.
+    """
+    pairs = list(pairs)
+    for i in range(0, len(pairs), batch_size):
+        query, aliases = build_pair_batch(pairs[i:i + batch_size], entity, fields, where_for_pair, first)
+        tables = graph_service.query_thegraph_tables(query)
+        for alias, pair in aliases.items():
+            rows = tables.get(alias) or []
+            if len(rows) >= first:
+                # the aliased sub-query was cut off; walk the whole pair instead
+                print(f"{pair} hit the {first} row limit, paging through the rest")
+                where = where_for_pair(*pair)
+                rows = [row for page in graph_service.paginate(entity, fields, where=where, cursor="blockNumber") for row in page]
+            yield pair, rows
+
+
+def sweep_pairs_batched(graph_service, pairs, entity, fields, write, where_for_pair=swap_pair_where, batch_size=DEFAULT_BATCH_SIZE):
+    written = 0
+    for pair, rows in query_pairs_batched(graph_service, pairs, entity, fields, where_for_pair, batch_size):
+        if not rows:
+            continue
+        write(pair, rows)
+        written += 1
+    return written
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from backend.config import GRAPH_CACHE_DIR, GRAPH_CACHE_HEAD_TTL, GRAPH_CACHE_MAX_BYTES
+
+PINNED_BLOCK_RE = re.compile(r"block\s*:\s*\{\s*number\s*:\s*(\d+)")
+
+
+def normalize_query(query):
+    return " ".join(query.split())
+
+
+def pinned_block(query):
+    """The block a query is pinned to with `block: {number: N}`, or None for head queries."""
+    match = PINNED_BLOCK_RE.search(query)
+    return int(match.group(1)) if match else None
+
+
+class QueryCache:
+    """Content-addressed on-disk cache of subgraph responses.
+
+    Entries are keyed by (query id, normalized query, variables, pinned
+    block). Responses pinned to a block can never change and are kept until
+    evicted; head responses expire after `head_ttl` seconds. The directory
+    is kept under `max_bytes` by evicting least recently used entries.
+    """
+
+    def __init__(self, directory=GRAPH_CACHE_DIR, max_bytes=GRAPH_CACHE_MAX_BYTES, head_ttl=GRAPH_CACHE_HEAD_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.head_ttl = head_ttl
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for _, _, size in self.entries())
+
+    def key(self, query_id, query, variables=None, block=None):
+        if block is None:
+            block = pinned_block(query)
+        material = json.dumps(
+            [query_id, normalize_query(query), variables or {}, block],
+            sort_keys=True,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def entries(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                yield entry.path, stat.st_mtime, stat.st_size
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not entry["pinned"] and time.time() - entry["stored_at"] > self.head_ttl:
+            self.discard(path)
+            return None
+        # mtime doubles as the LRU clock
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["data"]
+
+    def set(self, key, data, pinned):
+        path = self.path(key)
+        body = json.dumps({"stored_at": time.time(), "pinned": pinned, "data": data})
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body)
+        with self.lock:
+            try:
+                self.size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp, path)
+            self.size += len(body)
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def discard(self, path):
+        with self.lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                return
+            self.size -= size
+
+    def evict(self):
+        # drop least recently used entries until back to 90% of the budget
+        target = self.max_bytes * 0.9
+        for path, _, size in sorted(self.entries(), key=lambda e: e[1]):
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """The process-wide cache, or None when GRAPH_CACHE_DIR is empty."""
+    global _default_cache
+    if not GRAPH_CACHE_DIR:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = QueryCache()
+        return _default_cache
@@ -1,17 +1,25 @@
-from backend.services.graph.address_pairs import get_address_pairs
-from backend.services.graph.queries import queries
-from backend.services.graph.service import GraphService
-from backend.services.graph.subgraphs import SubgraphService
-# from backend.services.graph.service import *
-# 
+import sys
+
 import pandas as pd
-address_list = pd.read_csv('backend/address_list.csv')
 
-pull_deposits=queries['deposits']
+from backend.services.graph.queries import DEFAULT_START_BLOCK, catalog, deposit_fields, pair_variables
+from backend.services.graph.service import DEFAULT_CHAIN, GraphService
+
+
+def pair_deposits(graph_service, token1, token2, start_block=DEFAULT_START_BLOCK):
+    """Yield pages of the deposits into every pool of a token pair, paged per pool past `start_block`."""
+    pools = graph_service.query_thegraph(catalog["pools_by_pair"], variables=pair_variables(token1, token2, start_block))
+    for pool in pools:
+        where = {"pool": pool["id"], "blockNumber_gt": start_block}
+        yield from graph_service.paginate("deposits", deposit_fields, where=where, cursor="blockNumber")
 
 
-for token1, token2 in zip(address_list['token1'], address_list['token2']):
-        print('token1: ', token1)
-        print('pull_pools_query', pull_deposits)
-        query = pull_deposits.format(token1=token1, token2=token2)
-        
\ No newline at end of file
+if __name__ == "__main__":
+    # python -m backend.services.graph.deposits [protocol]
+    protocol = sys.argv[1] if len(sys.argv) > 1 else "uniswap-v3"
+    graph_service = GraphService(protocol=protocol, chain=DEFAULT_CHAIN)
+    address_list = pd.read_csv("backend/address_list.csv")
+    for token1, token2 in zip(address_list["token1"], address_list["token2"]):
+        print("token1: ", token1, "token2: ", token2)
+        deposits = sum(len(page) for page in pair_deposits(graph_service, token1, token2))
+        print(f"{token1}/{token2}: {deposits} deposits")
@@ -0,0 +1,78 @@
+import asyncio
+
+from backend.services.graph.gql import QueryDocument
+from backend.services.graph.queries import pair_variables
+
+DEFAULT_CONCURRENCY = 8
+
+
+async def query_pairs_async(graph_service, token_pairs, query_template, concurrency=DEFAULT_CONCURRENCY):
+    """Run one query per token pair concurrently and yield (pair, result) as each completes.
+
+    GraphService is blocking, so each query runs in a worker thread; the
+    semaphore caps how many are in flight against the endpoint at once.
+    `query_template` is either a callable `fetch(graph_service, pair)`
+    (e.g. GraphService.fetch_pair, which pages through the whole pair), a
+    QueryDocument sent with the pair as variables, or a %-template
+    formatted with the pair.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(pair):
+        async with semaphore:
+            try:
+                if callable(query_template):
+                    result = await asyncio.to_thread(query_template, graph_service, pair)
+                elif isinstance(query_template, QueryDocument):
+                    result = await asyncio.to_thread(
+                        graph_service.query_thegraph, query_template, variables=pair_variables(*pair)
+                    )
+                else:
+                    result = await asyncio.to_thread(
+                        graph_service.query_thegraph, query_template % tuple(pair)
+                    )
+            except Exception as e:
+                print(f"Error while processing query for {pair}: {e}")
+                result = None
+            return pair, result
+
+    tasks = [asyncio.create_task(fetch(pair)) for pair in token_pairs]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def sweep_token_pairs_async(graph_service, token_pairs, query_template, write, concurrency=DEFAULT_CONCURRENCY):
+    """Fan out all pair queries and hand each result to `write(pair, result)` as it lands.
+
+    Writes run one at a time off the event loop, so a single DB connection is
+    never shared between threads while fetches keep going. Returns
+    {"items": pairs written, "failed": pairs whose fetch or write failed},
+    so the failed pairs can be swept again.
+    """
+    summary = {"items": 0, "failed": []}
+    async for pair, result in query_pairs_async(graph_service, token_pairs, query_template, concurrency):
+        if result is None:
+            summary["failed"].append(pair)
+            continue
+        if not result:
+            continue
+        try:
+            await asyncio.to_thread(write, pair, result)
+        except Exception as e:
+            print(f"Error while writing {pair}: {e}")
+            summary["failed"].append(pair)
+            continue
+        summary["items"] += 1
+    if summary["failed"]:
+        print(f"{len(summary['failed'])} pairs failed: {summary['failed']}")
+    return summary
+
+
+def sweep_token_pairs(graph_service, token_pairs, query_template, write, concurrency=DEFAULT_CONCURRENCY):
+    return asyncio.run(
+        sweep_token_pairs_async(graph_service, token_pairs, query_template, write, concurrency)
+    )
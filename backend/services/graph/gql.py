@@ -0,0 +1,111 @@
+import hashlib
+import json
+import re
+
+
+class GraphQLEnum(str):
+    """A value rendered bare (e.g. `desc`, `BORROWER`) instead of as a quoted string."""
+
+
+def gql_literal(value):
+    """Render a python value as a GraphQL input literal (dict keys are field names)."""
+    if isinstance(value, GraphQLEnum):
+        return str(value)
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{k}: {gql_literal(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return "[" + ", ".join(gql_literal(v) for v in value) + "]"
+    raise TypeError(f"cannot render {type(value).__name__} as a GraphQL literal")
+
+
+def selection(fields):
+    if isinstance(fields, str):
+        return fields.strip()
+    return "\n".join(fields)
+
+
+def top_level_fields(fields):
+    """Response keys selected at the top level of `fields`; nested selections and arguments are skipped."""
+    names = set()
+    depth = parens = 0
+    aliased = False
+    for token in re.findall(r"[A-Za-z_]\w*|[{}():]", selection(fields)):
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+        elif token == "(":
+            parens += 1
+        elif token == ")":
+            parens -= 1
+        elif depth or parens:
+            continue
+        elif token == ":":
+            aliased = True
+        else:
+            # `alias: field` comes back under the alias
+            if not aliased:
+                names.add(token)
+            aliased = False
+    return names
+
+
+def collection_field(entity, fields, first=None, where=None, order_by=None, order_direction=None, block=None, alias=None):
+    """Build one root field selecting an entity collection, e.g. `swaps(first: 100, ...) {...}`."""
+    args = []
+    if first is not None:
+        args.append(f"first: {int(first)}")
+    if order_by is not None:
+        args.append(f"orderBy: {order_by}")
+    if order_direction is not None:
+        args.append(f"orderDirection: {order_direction}")
+    if where:
+        args.append(f"where: {gql_literal(where)}")
+    if block is not None:
+        args.append(f"block: {{number: {int(block)}}}")
+    head = f"{alias}: {entity}" if alias else entity
+    if args:
+        head += "(" + ", ".join(args) + ")"
+    return head + " {\n" + selection(fields) + "\n}"
+
+
+def collection_query(entity, fields, **kwargs):
+    return "{\n" + collection_field(entity, fields, **kwargs) + "\n}"
+
+
+class QueryDocument:
+    """A static GraphQL document whose inputs travel as `variables`.
+
+    Because the text never changes, its sha256 can be sent instead of the
+    text (automatic persisted queries) and the server can reuse its parse.
+    """
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text.strip()
+        self.sha256 = hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+
+    def payload(self, variables=None, persisted=False, include_text=True):
+        payload = {"variables": variables or {}}
+        if self.name:
+            payload["operationName"] = self.name
+        if include_text:
+            payload["query"] = self.text
+        if persisted:
+            payload["extensions"] = {"persistedQuery": {"version": 1, "sha256Hash": self.sha256}}
+        return payload
+
+    def __str__(self):
+        return self.text
+
+
+def as_document(query):
+    return query if isinstance(query, QueryDocument) else QueryDocument(None, query)
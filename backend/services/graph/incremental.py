@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.database.watermarks import newer_than
+from backend.services.graph.queries import DEFAULT_START_BLOCK, pair_where, swap_fields
+
+
+def pair_stream(token1, token2):
+    return f"{token1}/{token2}"
+
+
+def sync_stream(graph_service, watermarks, stream, entity, fields, where, write, start_block=DEFAULT_START_BLOCK):
+    """Fetch only the rows of one stream past its last fully ingested block.
+
+    Pages come in (blockNumber, id) order and the swap id does not follow
+    logIndex, so one block's rows can be spread over pages in any order.
+    The watermark therefore only ever records whole blocks: once a page is
+    written, every block before its last one is complete. A run interrupted
+    inside a block re-reads that block, which the (hash, logindex) upsert
+    makes harmless.
+    """
+    protocol, chain = graph_service.subgraph.protocol, graph_service.subgraph.chain
+    mark = watermarks.get(protocol, chain, stream, entity)
+    where = dict(where)
+    if mark is None:
+        where["blockNumber_gt"] = start_block
+        done = start_block
+    elif mark.log_index is not None:
+        # old per-row watermark: its block may be partial, so read it again
+        where["blockNumber_gte"] = mark.block_number
+        done = mark.block_number - 1
+    else:
+        where["blockNumber_gt"] = mark.block_number
+        done = mark.block_number
+    rows = 0
+    last_block = None
+    for page in graph_service.paginate(entity, fields, where=where, cursor="blockNumber"):
+        # only ever filtered against the watermark loaded at start
+        page = newer_than(page, mark)
+        if not page:
+            continue
+        write(page)
+        rows += len(page)
+        last_block = max(int(row["blockNumber"]) for row in page)
+        # the next page may still hold rows of last_block
+        if last_block - 1 > done:
+            done = last_block - 1
+            watermarks.advance(protocol, chain, stream, entity, done)
+    if last_block is not None and last_block > done:
+        # the stream is exhausted, so its last block is complete too
+        watermarks.advance(protocol, chain, stream, entity, last_block)
+    return rows
+
+
+def sync_token_pairs(graph_service, watermarks, token_pairs, write, entity="swaps", fields=swap_fields, concurrency=1):
+    """Incrementally sync the swap stream of every (tokenIn, tokenOut) pair.
+
+    Each pair writes and advances its watermark on its own pooled
+    connection, so pairs are fetched and written concurrently.
+    """
+
+    def sync_pair(pair):
+        token1, token2 = pair
+        try:
+            rows = sync_stream(
+                graph_service,
+                watermarks,
+                pair_stream(token1, token2),
+                entity,
+                fields,
+                pair_where(token1, token2),
+                lambda page: write(pair, page),
+            )
+        except Exception as e:
+            print(f"Error while syncing {pair}: {e}")
+            return 0
+        print(f"{pair}: {rows} new {entity}")
+        return rows
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        return sum(pool.map(sync_pair, token_pairs))
@@ -0,0 +1,74 @@
+import asyncio
+
+from backend.services.graph.fanout import query_pairs_async
+from backend.services.graph.registry import get_registry
+from backend.services.graph.service import CHAINS, GraphService, protocol, token_pairs, write_swaps
+
+# chains ingested at the same time
+DEFAULT_CHAIN_CONCURRENCY = 4
+# pair queries in flight per chain unless overridden in chain_budgets
+DEFAULT_PER_CHAIN_CONCURRENCY = 4
+
+
+async def ingest_chain(graph_service, token_pairs, query_template, write, concurrency, write_lock):
+    chain = graph_service.subgraph.chain
+    written = 0
+    async for pair, result in query_pairs_async(graph_service, token_pairs, query_template, concurrency):
+        if not result:
+            continue
+        # one writer at a time across all chains, off the event loop
+        async with write_lock:
+            await asyncio.to_thread(write, pair, result, chain)
+        written += 1
+    print(f"{graph_service.subgraph.protocol} on {chain}: {written} pairs written")
+    return written
+
+
+async def ingest_chains_async(
+    protocol,
+    token_pairs,
+    query_template,
+    write,
+    chains=CHAINS,
+    chain_concurrency=DEFAULT_CHAIN_CONCURRENCY,
+    per_chain_concurrency=DEFAULT_PER_CHAIN_CONCURRENCY,
+    chain_budgets=None,
+):
+    """Run the pair sweep for `protocol` on every chain it is deployed to, concurrently.
+
+    Deployments are resolved from deployment.json; chains without one are
+    skipped. `write(pair, result, chain)` receives every result tagged with
+    its chain, so all chains can land in one table.
+    """
+    chain_budgets = chain_budgets or {}
+    deployments = get_registry().deployments_for(protocol, chains)
+    print(f"{protocol} is deployed on {[d.chain for d in deployments]}")
+    chain_slots = asyncio.Semaphore(chain_concurrency)
+    write_lock = asyncio.Lock()
+
+    async def run(deployment):
+        async with chain_slots:
+            graph_service = GraphService(protocol=protocol, chain=deployment.chain)
+            budget = chain_budgets.get(deployment.chain, per_chain_concurrency)
+            try:
+                return deployment.chain, await ingest_chain(graph_service, token_pairs, query_template, write, budget, write_lock)
+            except Exception as e:
+                print(f"Error while ingesting {protocol} on {deployment.chain}: {e}")
+                return deployment.chain, None
+
+    return dict(await asyncio.gather(*(run(d) for d in deployments)))
+
+
+def ingest_chains(protocol, token_pairs, query_template, write, **kwargs):
+    return asyncio.run(ingest_chains_async(protocol, token_pairs, query_template, write, **kwargs))
+
+
+if __name__ == "__main__":
+    table = f"raw_graph_data_{protocol.split('-')[0]}"
+    summary = ingest_chains(
+        protocol,
+        token_pairs,
+        GraphService.fetch_pair,
+        lambda pair, result, chain: write_swaps(pair, result, source=protocol, table=table, chain=chain),
+    )
+    print("pairs written per chain", summary)
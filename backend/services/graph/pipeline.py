@@ -0,0 +1,240 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+import pandas as pd
+
+from backend.config import SWEEP_CONCURRENCY
+from backend.database import config as db_config
+from backend.database.schema import ensure_table
+from backend.database.send_data import DbService
+from backend.services.graph.service import DEFAULT_CHAIN, GraphService, dex_table_structure, protocol, token_pairs
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+DEFAULT_TRANSFORM_WORKERS = 2
+# results allowed to wait between two stages; fetchers stall once it is full
+DEFAULT_QUEUE_SIZE = 8
+
+SWAP_COLUMNS = [
+    "timestamp", "blocknumber", "hash", "logindex", "tokenin", "tokenout",
+    "amountout", "amountoutusd", "amountin", "amountinusd", "source", "chain",
+]
+INTEGER_COLUMNS = ("blocknumber", "logindex")
+NUMERIC_COLUMNS = ("amountout", "amountoutusd", "amountin", "amountinusd")
+
+_done = object()
+
+
+def swap_frame(pair, rows, source=protocol, chain=DEFAULT_CHAIN):
+    """Transform stage: one pair's swaps as a frame in the raw table's column layout."""
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+    if df.empty:
+        return None
+    df = df.drop(columns=["id"], errors="ignore")
+    df.columns = df.columns.str.lower()
+    for column in ("tokenin", "tokenout"):
+        if column in df.columns:
+            df[column] = df[column].str.get("symbol")
+    df["source"] = source
+    df["chain"] = chain
+    return df[[c for c in SWAP_COLUMNS if c in df.columns]]
+
+
+def typed_value(column, value):
+    # binary COPY needs python values of the column's type; it cannot encode NaN or NaT
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return None
+    if column in INTEGER_COLUMNS:
+        return int(value)
+    if column in NUMERIC_COLUMNS:
+        try:
+            return Decimal(str(value))
+        except InvalidOperation:
+            return None
+    if column == "timestamp" and not hasattr(value, "tzinfo"):
+        return pd.Timestamp(int(value), unit="s", tz="UTC").to_pydatetime()
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+def asyncpg_params(params):
+    """asyncpg.connect kwargs for psycopg2-style connection_params() (a DSN or database.ini keys)."""
+    if "dsn" in params:
+        return {"dsn": params["dsn"]}
+    kwargs = {}
+    server_settings = {}
+    for key, value in params.items():
+        if key in ("host", "user", "password"):
+            kwargs[key] = value
+        elif key == "dbname" or key == "database":
+            kwargs["database"] = value
+        elif key == "port":
+            # ini values are strings
+            kwargs["port"] = int(value)
+        elif key == "sslmode":
+            # asyncpg takes the libpq sslmode names
+            kwargs["ssl"] = value
+        elif key == "connect_timeout":
+            kwargs["timeout"] = float(value)
+        elif key == "application_name":
+            server_settings[key] = value
+        else:
+            raise ValueError(f"unsupported connection parameter {key} for asyncpg")
+    if server_settings:
+        kwargs["server_settings"] = server_settings
+    return kwargs
+
+
+class ThreadedWriter:
+    """Load stage through the psycopg2 pool, run off the event loop."""
+
+    def __init__(self, table):
+        self.table = table
+
+    async def open(self):
+        await asyncio.to_thread(ensure_table, "swaps", self.table)
+
+    async def write(self, df):
+        return await asyncio.to_thread(DbService.upsert_data, df, self.table, dex_table_structure)
+
+    async def close(self):
+        pass
+
+
+class AsyncpgWriter:
+    """Load stage on one asyncpg connection: binary COPY into a staging table, then upsert."""
+
+    def __init__(self, table):
+        self.table = table
+        self.conn = None
+
+    async def open(self):
+        await asyncio.to_thread(ensure_table, "swaps", self.table)
+        self.conn = await asyncpg.connect(**asyncpg_params(db_config.connection_params()))
+
+    async def write(self, df):
+        columns = list(df.columns)
+        records = [
+            tuple(typed_value(c, v) for c, v in zip(columns, row))
+            for row in df.astype(object).itertuples(index=False, name=None)
+        ]
+        keys = ", ".join(f'"{c}"' for c in columns)
+        staging = f"{self.table}_staging"
+        async with self.conn.transaction():
+            await self.conn.execute(
+                f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {keys} FROM {self.table} WITH NO DATA"
+            )
+            await self.conn.copy_records_to_table(staging, records=records, columns=columns)
+            status = await self.conn.execute(
+                f"INSERT INTO {self.table} ({keys}) SELECT {keys} FROM {staging} ON CONFLICT (hash, logindex) DO NOTHING"
+            )
+        return int(status.split()[-1])
+
+    async def close(self):
+        if self.conn is not None:
+            await self.conn.close()
+
+
+def make_writer(table):
+    return AsyncpgWriter(table) if asyncpg is not None else ThreadedWriter(table)
+
+
+async def run_pipeline_async(
+    items,
+    fetch,
+    transform,
+    writer,
+    fetch_concurrency=SWEEP_CONCURRENCY,
+    transform_workers=DEFAULT_TRANSFORM_WORKERS,
+    queue_size=DEFAULT_QUEUE_SIZE,
+):
+    """Overlap fetching, transforming and loading of `items`.
+
+    `fetch(item)` (blocking, e.g. a subgraph query) runs in up to
+    `fetch_concurrency` threads, `transform(item, rows)` in a pool of
+    `transform_workers`, and `writer.write(frame)` loads one frame at a
+    time. The stages are joined by queues of `queue_size`, so a slow stage
+    holds back the ones before it instead of letting results pile up.
+    """
+    fetched = asyncio.Queue(maxsize=queue_size)
+    transformed = asyncio.Queue(maxsize=queue_size)
+    slots = asyncio.Semaphore(fetch_concurrency)
+    summary = {"items": 0, "rows": 0, "failed": []}
+    loop = asyncio.get_running_loop()
+
+    async def fetcher(item):
+        async with slots:
+            try:
+                rows = await asyncio.to_thread(fetch, item)
+            except Exception as e:
+                print(f"Error while fetching {item}: {e}")
+                summary["failed"].append(item)
+                return
+            # waits here, still holding its slot, while the transform stage is behind
+            await fetched.put((item, rows))
+
+    async def transformer(pool):
+        while True:
+            got = await fetched.get()
+            if got is _done:
+                return
+            item, rows = got
+            try:
+                frame = await loop.run_in_executor(pool, transform, item, rows)
+            except Exception as e:
+                print(f"Error while transforming {item}: {e}")
+                summary["failed"].append(item)
+                continue
+            if frame is not None:
+                await transformed.put((item, frame))
+
+    async def loader():
+        while True:
+            got = await transformed.get()
+            if got is _done:
+                return
+            item, frame = got
+            try:
+                summary["rows"] += await writer.write(frame)
+                summary["items"] += 1
+            except Exception as e:
+                print(f"Error while writing {item}: {e}")
+                summary["failed"].append(item)
+
+    await writer.open()
+    try:
+        with ThreadPoolExecutor(max_workers=transform_workers) as pool:
+            load = asyncio.create_task(loader())
+            transforms = [asyncio.create_task(transformer(pool)) for _ in range(transform_workers)]
+            await asyncio.gather(*(fetcher(item) for item in items))
+            for _ in transforms:
+                await fetched.put(_done)
+            await asyncio.gather(*transforms)
+            await transformed.put(_done)
+            await load
+    finally:
+        await writer.close()
+    return summary
+
+
+def run_pipeline(items, fetch, transform, writer, **kwargs):
+    return asyncio.run(run_pipeline_async(items, fetch, transform, writer, **kwargs))
+
+
+def sweep_pairs_pipelined(graph_service, token_pairs, table, source=protocol, **kwargs):
+    """The per-pair swap sweep with fetch, transform and load overlapped."""
+    fetch = lambda pair: graph_service.fetch_pair(pair, columnar=True)
+    transform = functools.partial(swap_frame, source=source, chain=graph_service.subgraph.chain)
+    return run_pipeline(token_pairs, fetch, transform, make_writer(table), **kwargs)
+
+
+if __name__ == "__main__":
+    graph_service = GraphService(protocol=protocol, chain=DEFAULT_CHAIN)
+    summary = sweep_pairs_pipelined(graph_service, token_pairs, f"raw_graph_data_{protocol.split('-')[0]}")
+    print("pipeline summary", summary)
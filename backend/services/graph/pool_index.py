@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+
+from backend.config import POOL_INDEX_DIR
+
+pool_fields = """
+id
+createdBlockNumber
+inputTokens {
+  id
+  symbol
+}
+fees {
+  feeType
+  feePercentage
+}
+"""
+
+
+def pair_key(token1, token2):
+    # unordered, so (A, B) and (B, A) share one entry; works for symbols and addresses alike
+    return tuple(sorted((str(token1).lower(), str(token2).lower())))
+
+
+def fee_tier(pool):
+    for fee in pool.get("fees") or []:
+        if fee.get("feeType") == "FIXED_TRADING_FEE" and fee.get("feePercentage") is not None:
+            return float(fee["feePercentage"])
+    return None
+
+
+def compact_pool(pool):
+    tokens = pool.get("inputTokens") or []
+    return {
+        "id": pool["id"],
+        "created": int(pool.get("createdBlockNumber") or 0),
+        "fee": fee_tier(pool),
+        "addresses": [t.get("id") for t in tokens],
+        "symbols": [t.get("symbol") for t in tokens],
+    }
+
+
+class PoolIndex:
+    """Every liquidity pool of one deployment, keyed by unordered token pair.
+
+    The first load pages through the whole `liquidityPools` collection once;
+    later refreshes only ask for pools created after the newest block seen.
+    The index is kept on disk, so lookups for all pairs are dict hits.
+    """
+
+    def __init__(self, graph_service, path=None):
+        self.graph_service = graph_service
+        self.path = path or os.path.join(POOL_INDEX_DIR, f"{graph_service.subgraph.query_id}.json")
+        self.lock = threading.Lock()
+        self.pools = {}
+        self.by_pair = {}
+        self.last_block = None
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.last_block = stored.get("last_block")
+        for pool in stored.get("pools", []):
+            self.add(pool)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        body = json.dumps({"last_block": self.last_block, "pools": list(self.pools.values())})
+        tmp = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp, self.path)
+
+    def add(self, pool):
+        self.pools[pool["id"]] = pool
+        # a pool is reachable by address pair and by symbol pair
+        for values in (pool["addresses"], pool["symbols"]):
+            for i, token1 in enumerate(values):
+                for token2 in values[i + 1:]:
+                    if token1 and token2:
+                        self.by_pair.setdefault(pair_key(token1, token2), {})[pool["id"]] = pool
+
+    def refresh(self):
+        """Fetch pools created since the last refresh (all of them on the first run)."""
+        with self.lock:
+            where = None if self.last_block is None else {"createdBlockNumber_gt": self.last_block}
+            added = 0
+            for page in self.graph_service.paginate("liquidityPools", pool_fields, where=where):
+                for row in page:
+                    pool = compact_pool(row)
+                    self.add(pool)
+                    self.last_block = max(self.last_block or 0, pool["created"])
+                    added += 1
+            self.save()
+        print(f"pool index {self.path}: {added} new pools, {len(self.pools)} total, up to block {self.last_block}")
+        return added
+
+    def lookup(self, token1, token2, fee=None):
+        """Pools trading token1 against token2 (symbols or addresses), optionally of one fee tier."""
+        pools = list(self.by_pair.get(pair_key(token1, token2), {}).values())
+        if fee is not None:
+            pools = [p for p in pools if p["fee"] == fee]
+        return pools
+
+    def pool_ids(self, token1, token2, fee=None):
+        return [p["id"] for p in self.lookup(token1, token2, fee)]
+
+
+def get_pool_index(graph_service, refresh=True):
+    index = PoolIndex(graph_service)
+    if refresh:
+        index.refresh()
+    return index
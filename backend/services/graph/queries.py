@@ -1,3 +1,8 @@
+from backend.services.graph.gql import QueryDocument
+
+# first block the raw swap/deposit tables are loaded from
+DEFAULT_START_BLOCK = 17742547
+
 queries = {'swaps':"""
 query UniswapV3SwapTransactions {
   liquidityPools(
@@ -68,35 +73,6 @@ query UniswapV3SwapTransactions {
     amountInUSD
   }
 }""",
-'deposits':"""query UniswapV3DepositsTransactions {{
-  liquidityPools(
-    where: {{
-      and: [
-        inputTokens_contains: ["{token1}", "{token2}"]
-        {{ deposits_: {{ blockNumber_gt: 17742547 }} }}
-      ]
-    }}
-  ) {{
-    id
-    inputTokens {{
-      id
-      symbol
-      decimals
-      name
-    }}
-    deposits {{
-      timestamp
-      blockNumber
-      hash
-      logIndex
-      inputTokenAmounts
-      inputTokens {{
-        symbol
-      }}
-    }}
-  }}
-}}
-""", 
 'swap_data':"""query UniswapV3SwapTransactions {{
   swaps (
     where:{{
@@ -133,4 +109,65 @@ query UniswapV3SwapTransactions {
       amountInUSD
   }}
 }}"""
-}
\ No newline at end of file
+}
+
+# selection set for swap rows, for use with GraphService.paginate
+swap_fields = """
+id
+timestamp
+blockNumber
+hash
+logIndex
+tokenIn {
+  symbol
+}
+tokenOut {
+  symbol
+}
+amountOut
+amountOutUSD
+amountIn
+amountInUSD
+"""
+
+# selection set for deposit rows, for use with GraphService.paginate
+deposit_fields = """
+id
+timestamp
+blockNumber
+hash
+logIndex
+inputTokenAmounts
+amountUSD
+inputTokens {
+  symbol
+}
+"""
+
+
+# static documents; token symbols, blocks and paging go in `variables`
+catalog = {
+    'pools_by_pair': QueryDocument('PoolsByPair', """
+query PoolsByPair($token1: String!, $token2: String!, $startBlock: BigInt!) {
+  liquidityPools(
+    where: {
+      and: [
+        { inputTokens_: { symbol: $token1 } }
+        { inputTokens_: { symbol: $token2 } }
+        { deposits_: { blockNumber_gt: $startBlock } }
+      ]
+    }
+  ) {
+    id
+  }
+}"""),
+}
+
+
+def pair_variables(token1, token2, start_block=DEFAULT_START_BLOCK):
+    return {'token1': token1, 'token2': token2, 'startBlock': start_block}
+
+
+def pair_where(token1, token2):
+    # `where` filter of one (tokenIn, tokenOut) swap stream, for use with GraphService.paginate
+    return {'tokenIn_': {'symbol': token1}, 'tokenOut_': {'symbol': token2}}
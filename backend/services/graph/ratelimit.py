@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+
+# requests/second allowed per endpoint host; anything else gets DEFAULT_RATE
+ENDPOINT_RATES = {
+    "api.thegraph.com": 8,
+    "gateway-arbitrum.network.thegraph.com": 20,
+}
+DEFAULT_RATE = 10
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to an endpoint that keeps failing."""
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """AIMD cap on in-flight requests: +1 per window of successes, halved when throttled."""
+
+    def __init__(self, initial=8, minimum=1, maximum=64):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify()
+
+    def on_success(self):
+        with self.cond:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+    def on_throttle(self):
+        with self.cond:
+            self.limit = max(self.minimum, self.limit / 2)
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; lets one trial through after `reset_timeout`."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = "closed"
+        self.opened_at = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half-open"
+                return True
+            # open, or half-open with its trial request already in flight
+            return False
+
+    def on_success(self):
+        with self.lock:
+            self.failures = 0
+            self.state = "closed"
+
+    def on_throttle(self):
+        # the endpoint answered, it is only busy: settle a trial without counting a failure
+        with self.lock:
+            if self.state == "half-open":
+                self.state = "closed"
+
+    def retry_in(self):
+        with self.lock:
+            if self.state != "open":
+                return 0
+            return max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def on_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class EndpointPolicy:
+    """Rate limit, adaptive concurrency, retries and circuit breaking for one endpoint."""
+
+    def __init__(self, name, rate=DEFAULT_RATE, max_retries=DEFAULT_MAX_RETRIES):
+        self.name = name
+        self.bucket = TokenBucket(rate)
+        self.concurrency = AdaptiveConcurrency()
+        # one call's own retries can never trip the breaker on their own
+        self.breaker = CircuitBreaker(failure_threshold=max_retries + 1)
+        self.max_retries = max_retries
+
+    def call(self, send, classify):
+        """Run `send()` until it succeeds, fails permanently or retries run out.
+
+        `classify(exc)` returns None for permanent errors, otherwise
+        (throttled, retry_after) for retryable ones. Throttling slows the
+        endpoint down but does not count toward the circuit breaker; an
+        open circuit is waited out and probed again while retries remain.
+        """
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                if attempt >= self.max_retries:
+                    raise CircuitOpenError(f"circuit open for {self.name}, not sending")
+                delay = max(self.breaker.retry_in(), backoff(attempt))
+                print(f"{self.name}: circuit open; probe {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self.bucket.acquire()
+            self.concurrency.acquire()
+            try:
+                result = send()
+            except Exception as e:
+                retry = classify(e)
+                if retry is None:
+                    # our fault (bad query, auth), not the endpoint's
+                    self.breaker.on_success()
+                    raise
+                throttled, retry_after = retry
+                if throttled:
+                    self.breaker.on_throttle()
+                    self.concurrency.on_throttle()
+                else:
+                    self.breaker.on_failure()
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff(attempt, retry_after)
+                print(f"{self.name}: {e}; retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                attempt += 1
+            else:
+                self.breaker.on_success()
+                self.concurrency.on_success()
+                return result
+            finally:
+                self.concurrency.release()
+            time.sleep(delay)
+
+
+def backoff(attempt, retry_after=None):
+    # exponential backoff with full jitter, never shorter than a server-sent Retry-After
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def get_policy(host):
+    """The process-wide policy for an endpoint host, so all transports share its limits."""
+    with _policies_lock:
+        if host not in _policies:
+            _policies[host] = EndpointPolicy(host, rate=ENDPOINT_RATES.get(host, DEFAULT_RATE))
+        return _policies[host]
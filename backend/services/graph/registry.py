@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import namedtuple
+
+from backend.config import SUBGRAPHS_SNAPSHOT_DIR
+
+# one (protocol, chain) deployment from the Messari subgraphs deployment.json
+DeploymentEntry = namedtuple(
+    "DeploymentEntry",
+    ["protocol", "chain", "base", "service_type", "query_id", "template_file_location"],
+)
+
+
+def deployment_file():
+    return os.getcwdb().decode("utf-8") + "/subgraphs/deployment/deployment.json"
+
+
+def pick_service(services):
+    # the decentralized network is preferred over the hosted service
+    for service_type in ("decentralized-network", "hosted-service"):
+        if service_type in services:
+            return service_type, services[service_type].get("query-id")
+    return None, None
+
+
+class DeploymentRegistry:
+    """deployment.json parsed once and indexed by (protocol, chain)."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path) as f:
+            self.protocols = json.load(f)
+        self.entries = {}
+        for protocol, spec in self.protocols.items():
+            for key, deployment in (spec.get("deployments") or {}).items():
+                prefix = f"{protocol}-"
+                if not key.startswith(prefix):
+                    continue
+                chain = key[len(prefix):]
+                service_type, query_id = pick_service(deployment.get("services") or {})
+                try:
+                    template_file_location = f"subgraphs/subgraphs/{spec['base']}/protocols/{protocol}/config/templates/{deployment['files']['template']}"
+                except (KeyError, TypeError):
+                    template_file_location = None
+                self.entries[(protocol, chain)] = DeploymentEntry(
+                    protocol, chain, spec.get("base"), service_type, query_id, template_file_location
+                )
+
+    def protocol(self, protocol):
+        return self.protocols[protocol]
+
+    def get(self, protocol, chain):
+        self.protocol(protocol)
+        entry = self.entries.get((protocol, chain))
+        if entry is None:
+            # protocol is not deployed on given chain
+            raise NotImplementedError(f"no subgraph deployed for {protocol} on {chain}")
+        if entry.query_id is None:
+            # protocol does not have any deployments
+            raise NotImplementedError(f"no subgraphs deployed for {protocol} at all")
+        return entry
+
+    def chains(self, protocol):
+        return sorted(chain for p, chain in self.entries if p == protocol)
+
+    def deployments_for(self, protocol, chains):
+        """The queryable deployments of `protocol` among `chains`."""
+        entries = []
+        for chain in chains:
+            entry = self.entries.get((protocol, chain))
+            if entry is not None and entry.query_id is not None:
+                entries.append(entry)
+        return entries
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def snapshot_path(path, snapshot_dir=None):
+    # a new snapshot whenever deployment.json is edited, moved or swapped for another checkout
+    stat = os.stat(path)
+    key = f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+    name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(snapshot_dir or SUBGRAPHS_SNAPSHOT_DIR, f"registry-{name}.pkl")
+
+
+def load_registry(path, snapshot_dir=None):
+    """The registry for `path`, unpickled from its snapshot or parsed and snapshotted."""
+    snapshot = snapshot_path(path, snapshot_dir)
+    try:
+        with open(snapshot, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        pass
+    registry = DeploymentRegistry(path)
+    try:
+        os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+        tmp = f"{snapshot}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(registry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snapshot)
+    except OSError as e:
+        print(f"could not write registry snapshot {snapshot}: {e}")
+    return registry
+
+
+def get_registry(path=None):
+    """The process-wide registry for a deployment file, loaded on first use."""
+    path = os.path.abspath(path or deployment_file())
+    with _registries_lock:
+        if path not in _registries:
+            _registries[path] = load_registry(path)
+        return _registries[path]
+
+
+class SubgraphsIndex:
+    """Memoized filesystem lookups into the subgraphs checkout, shared by every SubgraphService.
+
+    Each protocol base is only walked the first time one of its deployments
+    asks for its mappings, however many protocols share that base.
+    """
+
+    def __init__(self, root="subgraphs/subgraphs"):
+        self.root = root
+        self.lock = threading.Lock()
+        self._mappers = {}
+        self._schema_files = {}
+
+    def mappers(self, base):
+        with self.lock:
+            if base not in self._mappers:
+                src = f"{self.root}/{base}/src"
+                found = []
+                for directory, _, files in os.walk(src):
+                    found.extend(f"{directory}/{name}" for name in files if name.endswith(".ts"))
+                self._mappers[base] = sorted(found)
+            return list(self._mappers[base])
+
+    def schema_file(self, base):
+        with self.lock:
+            if base not in self._schema_files:
+                path = f"{self.root}/{base}/schema.graphql"
+                self._schema_files[base] = path if os.path.isfile(path) else None
+            return self._schema_files[base]
+
+
+_subgraphs_index = None
+
+
+def get_subgraphs_index():
+    global _subgraphs_index
+    with _registries_lock:
+        if _subgraphs_index is None:
+            _subgraphs_index = SubgraphsIndex()
+        return _subgraphs_index
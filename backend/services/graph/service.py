@@ -1,22 +1,35 @@
 import datetime as dt
-import json
-import os
+import time
 
 import pandas as pd
-import requests
 import sys
 from backend.services.graph.queries import queries
 
 
 sys.path.append('../')
 
-from backend.config import GRAPH_API_KEY, BEARER_TOKEN
+from backend.config import GRAPH_API_KEY, BEARER_TOKEN, SWEEP_BATCH_SIZE, SWEEP_CONCURRENCY, SWEEP_INCREMENTAL, SWEEP_SINGLE_STREAM
+from backend.services.graph.registry import get_registry
 from backend.services.graph.subgraphs import SubgraphService
+from backend.services.graph.transport import get_default_transport
 DEFAULT_PROTOCOL = "aave-forks"
 DEFAULT_CHAIN = "ethereum"
+# graph-node refuses `first` above 1000
+MAX_PAGE_SIZE = 1000
+MIN_PAGE_SIZE = 100
+# pages returning faster than half this grow, slower ones shrink
+TARGET_PAGE_LATENCY = 2.0
+from backend.database.schema import ensure_table, swap_table_structure
 from backend.database.send_data import DbService
-from backend.services.graph.queries import queries
+from backend.database.watermarks import WatermarkStore
+from backend.services.graph.queries import DEFAULT_START_BLOCK, pair_where, queries, swap_fields
 from backend.services.graph.address_pairs import get_address_pairs
+from backend.services.graph.batching import sweep_pairs_batched
+from backend.services.graph.cache import get_default_cache, pinned_block
+from backend.services.graph.fanout import sweep_token_pairs
+from backend.services.graph.gql import as_document, collection_query, selection, top_level_fields
+from backend.services.graph.incremental import sync_token_pairs
+from backend.services.graph.swap_stream import sweep_universe, sync_universe
 CHAINS = [
     "arbitrum",
     "aurora",
@@ -36,21 +49,10 @@ CHAINS = [
     "moonriver",
 ]
 address_list = get_address_pairs()
-dex_table_structure="""id SERIAL PRIMARY KEY,
-    timestamp VARCHAR(255),
-    blocknumber TEXT,
-    hash VARCHAR(255),
-    logindex VARCHAR(255),
-    tokenin TEXT,
-    tokenout TEXT,
-    amountout VARCHAR(255), 
-    amountoutusd VARCHAR(255),
-    amountin VARCHAR(255), 
-    amountinusd VARCHAR(255),
-    source VARCHAR(255)"""
+dex_table_structure=swap_table_structure
 
 # arbitrum_subgraphs =['JCNWRypm7FYwV8fx5HhzZPSFaMxgkPuw4TnR3Gpi81zk']
-def execute_query_thegraph(subgraph_id, query, hosted=True):
+def thegraph_endpoint(subgraph_id, hosted=True):
     namespace = "messari"
     print(subgraph_id)
     
@@ -78,76 +80,233 @@ def execute_query_thegraph(subgraph_id, query, hosted=True):
         }
 
     query_url = f"{base_url}{subgraph_id}"
+    return query_url, headers
+
 
+def execute_query_thegraph_tables(subgraph_id, query, hosted=True, transport=None, variables=None):
+    query_url, headers = thegraph_endpoint(subgraph_id, hosted)
     # print('query_url',query_url)
-    r = requests.post(query_url, json={"query": query}, headers=headers)
-    r.raise_for_status()
+    if transport is None:
+        transport = get_default_transport()
+    body = transport.post_document(query_url, query, variables=variables, headers=headers)
     try:
-        # assumes only one table is being queried
-        first_table_name = list(r.json()["data"].keys())[0]
-        return r.json()["data"][first_table_name]
+        # every root field (or alias) of the query, keyed by name
+        return body["data"]
     except KeyError:
         # TODO: error handling
-        print(r.json())
+        print(body)
+
+
+def execute_query_thegraph(subgraph_id, query, hosted=True, transport=None, variables=None):
+    data = execute_query_thegraph_tables(subgraph_id, query, hosted=hosted, transport=transport, variables=variables)
+    if data is None:
+        return None
+    # assumes only one table is being queried
+    first_table_name = list(data.keys())[0]
+    return data[first_table_name]
 class GraphService:
-    def __init__(self, protocol=DEFAULT_PROTOCOL, chain=DEFAULT_CHAIN):
+    def __init__(self, protocol=DEFAULT_PROTOCOL, chain=DEFAULT_CHAIN, transport=None, cache=None):
         # print('protocol', protocol)
         # print('DEFAULT CHAIN', chain)
         # os.chdir('..')
-        self.build_subgraphs_json()
-        # print('after build_subgraphs_json')
+        # construction is a registry lookup; build_subgraphs_json() is only needed for the full table
         self.subgraph = SubgraphService(protocol, chain)
+        # every GraphService shares one pooled keep-alive transport unless given its own
+        self.transport = transport if transport is not None else get_default_transport()
+        # responses are cached on disk unless caching is disabled in config
+        self.cache = cache if cache is not None else get_default_cache()
     
     def ensure_enumerable(self, data):
         if not isinstance(data, list):
             return [data]
         return data
 
-    def query_thegraph(self, gql):
-        data = execute_query_thegraph(
+    def format_rows(self, data):
+        data = self.ensure_enumerable(data)
+        for dict_item in data:
+            if "timestamp" in dict_item:
+                # print(dt.datetime.utcfromtimestamp(int(val)).strftime('%Y-%m-%d %H:%M:%S'))
+                dict_item["timestamp"] = dt.datetime.utcfromtimestamp(int(dict_item["timestamp"])).strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
+        return data
+
+    def to_columnar(self, data, timestamps="datetime64"):
+        """Rows as a DataFrame with `timestamp` converted in one vectorized pass.
+
+        timestamps="datetime64" gives a UTC datetime64 column, "epoch" keeps
+        int64 seconds.
+        """
+        if timestamps not in ("datetime64", "epoch"):
+            raise ValueError(f"unsupported timestamps {timestamps}, use 'datetime64' or 'epoch'")
+        df = pd.DataFrame(self.ensure_enumerable(data))
+        if "timestamp" in df.columns:
+            epoch = pd.to_numeric(df["timestamp"]).astype("int64")
+            df["timestamp"] = pd.to_datetime(epoch, unit="s", utc=True) if timestamps == "datetime64" else epoch
+        return df
+
+    def fetch_tables(self, gql, variables=None):
+        """Every root field of `gql` as returned by the subgraph, served from the cache when possible."""
+        key = None
+        if self.cache is not None:
+            block = pinned_block(str(gql))
+            key = self.cache.key(self.subgraph.query_id, str(gql), variables=variables, block=block)
+            tables = self.cache.get(key)
+            if tables is not None:
+                return tables
+        tables = execute_query_thegraph_tables(
             self.subgraph.query_id,
             gql,
             hosted=(self.subgraph.service_type == "hosted-service"),
+            transport=self.transport,
+            variables=variables,
         )
+        if tables is not None and key is not None:
+            self.cache.set(key, tables, pinned=block is not None)
+        return tables
+
+    def query_thegraph(self, gql, columnar=False, timestamps="datetime64", variables=None):
+        tables = self.fetch_tables(gql, variables)
+        if tables == None:
+            raise ValueError("Data from execute_query_thegraph was None.")
+        # assumes only one table is being queried
+        data = tables[list(tables.keys())[0]]
         if data == None:
             raise ValueError("Data from execute_query_thegraph was None.")
-        data = self.ensure_enumerable(data)
-        for dict_item in data:
-            for key, val in dict_item.items():
-                if key == "timestamp":
-                    # print(dt.datetime.utcfromtimestamp(int(val)).strftime('%Y-%m-%d %H:%M:%S'))
-                    dict_item[key] = dt.datetime.utcfromtimestamp(int(val)).strftime(
-                        "%Y-%m-%d %H:%M:%S"
-                    )
-        print("==========the graph response (formatted):==========\n", data)
+        if columnar:
+            data = self.to_columnar(data, timestamps)
+        else:
+            data = self.format_rows(data)
+        print(f"==========the graph response: {len(data)} rows==========")
         return data
+
+    def query_thegraph_tables(self, gql, variables=None):
+        """Run a query with several root fields/aliases and return {name: rows}."""
+        tables = self.fetch_tables(gql, variables)
+        if tables == None:
+            raise ValueError("Data from execute_query_thegraph_tables was None.")
+        return {name: self.format_rows(rows) for name, rows in tables.items()}
+
+    def stream_records(self, gql, variables=None):
+        """Yield formatted rows of a single-entity query as the response is parsed.
+
+        Meant for very large responses (e.g. `hourlySnapshots(first: 1000000)`):
+        rows go straight to the caller instead of being held in memory, so
+        this path bypasses the response cache.
+        """
+        query_url, headers = thegraph_endpoint(
+            self.subgraph.query_id, hosted=(self.subgraph.service_type == "hosted-service")
+        )
+        payload = as_document(gql).payload(variables)
+        for row in self.transport.stream_records(query_url, payload, headers=headers):
+            yield self.format_rows(row)[0]
+
+    def paginate(
+        self,
+        entity,
+        fields,
+        where=None,
+        cursor="id",
+        page_size=MIN_PAGE_SIZE,
+        max_page_size=MAX_PAGE_SIZE,
+        target_latency=TARGET_PAGE_LATENCY,
+        block=None,
+    ):
+        """Lazily walk an entity collection, yielding one page (list of rows) at a time.
+
+        Pages are keyset-paginated rather than skipped: with cursor="id" each
+        request asks for `id_gt` the last id seen, with cursor="blockNumber"
+        it asks for rows after the last (blockNumber, id). The page size
+        doubles while responses come back well under `target_latency` and
+        halves when they are slower, staying within [MIN_PAGE_SIZE, max_page_size].
+        """
+        if cursor not in ("id", "blockNumber"):
+            raise ValueError(f"unsupported cursor {cursor}, use 'id' or 'blockNumber'")
+        fields = selection(fields)
+        # the cursor columns must come back in every row, not just in a nested selection
+        selected = top_level_fields(fields)
+        for name in ("blockNumber", "id") if cursor == "blockNumber" else ("id",):
+            if name not in selected:
+                fields = f"{name}\n{fields}"
+        where = dict(where or {})
+        min_page_size = min(MIN_PAGE_SIZE, max_page_size)
+        first = max(min_page_size, min(page_size, max_page_size))
+        last = None
+        while True:
+            if last is None:
+                page_where = where
+            elif cursor == "id":
+                page_where = dict(where, id_gt=last["id"])
+            else:
+                after = {
+                    "or": [
+                        {"blockNumber_gt": int(last["blockNumber"])},
+                        {"blockNumber": int(last["blockNumber"]), "id_gt": last["id"]},
+                    ]
+                }
+                page_where = {"and": [where, after]} if where else after
+            gql = collection_query(
+                entity,
+                fields,
+                first=first,
+                where=page_where,
+                order_by=cursor,
+                order_direction="asc",
+                block=block,
+            )
+            started = time.monotonic()
+            page = self.query_thegraph(gql)
+            elapsed = time.monotonic() - started
+            if page:
+                yield page
+            if len(page) < first:
+                return
+            last = page[-1]
+            if elapsed < target_latency / 2:
+                first = min(first * 2, max_page_size)
+            elif elapsed > target_latency:
+                first = max(first // 2, min_page_size)
+
+    def fetch_pair(self, pair, entity="swaps", fields=swap_fields, start_block=DEFAULT_START_BLOCK, columnar=False):
+        """Every row of one (tokenIn, tokenOut) pair past `start_block`, walked with paginate.
+
+        Per-pair sweeps go through here so no pair is cut off at the
+        subgraph's default page of 100 rows.
+        """
+        where = dict(pair_where(*pair), blockNumber_gt=start_block)
+        rows = [row for page in self.paginate(entity, fields, where=where, cursor="blockNumber") for row in page]
+        if not columnar:
+            return rows
+        df = pd.DataFrame(rows)
+        if "timestamp" in df.columns:
+            # paginate hands back formatted UTC timestamps
+            df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+        return df
     
 
-    def build_subgraphs_json(self):
+    def build_subgraphs_json(self, chains=(DEFAULT_CHAIN,)):
         # sys.path.append('../')
         # print('sys.path', sys.path)
         # print('os.getcwdb()', os.getcwdb())
         # print('whole path', os.getcwdb().decode("utf-8") + "/subgraphs/deployment/deployment.json")
-        deployments = json.load(
-            open(os.getcwdb().decode("utf-8") + "/subgraphs/deployment/deployment.json")
-        )
+        deployments = get_registry().protocols
         li = []
         for protocol in deployments:
-            # for chain in CHAINS:
-            # print('in protocol')
-            try:
-                df = pd.DataFrame([SubgraphService(protocol, 'ethereum').__dict__])
-                df.pop("protocol")
-                df = df.join(df["deployments"].apply(pd.Series), lsuffix="_")
-                df.pop("deployments_")
-                df["deployments"].iloc[0] = (
-                    df["deployments"]
-                    .apply(pd.Series)[f"{protocol}-{'ethereum'}"]
-                    .iloc[0]
-                )
-                li.append(df)
-            except NotImplementedError:
-                pass
+            for chain in chains:
+                # print('in protocol')
+                try:
+                    df = pd.DataFrame([SubgraphService(protocol, chain).as_dict()])
+                    df.pop("protocol")
+                    df = df.join(df["deployments"].apply(pd.Series), lsuffix="_")
+                    df.pop("deployments_")
+                    df["deployments"].iloc[0] = (
+                        df["deployments"]
+                        .apply(pd.Series)[f"{protocol}-{chain}"]
+                        .iloc[0]
+                    )
+                    li.append(df)
+                except NotImplementedError:
+                    pass
         df = pd.concat(li)
         df = df.set_index(["protocol", "chain"])
         json_dump = df.to_json(
@@ -221,8 +380,10 @@ query_liquidity = """
   }
 }"""
 
+# each market's hourly snapshots are paged separately, see snapshots.py
 query_uniswap_pools = """{
   markets {
+    id
     inputToken {
         name
         id
@@ -233,10 +394,6 @@ query_uniswap_pools = """{
         symbol
         id
       }
-    hourlySnapshots (first: 1000000, orderBy: blockNumber, orderDirection: desc) {
-    totalValueLockedUSD
-    timestamp
-  }
 }
 }"""
 
@@ -356,11 +513,8 @@ query_uniswap= """query UniswapV3SwapTransactions {{
 #     result = graph_service.query_thegraph(query)
 
 protocol = 'pancakeswap-v3'
-graph_service = GraphService(protocol = 'pancakeswap-v3', chain='ethereum')
-print('after graph_service')
 
 swap_data_query=queries['swap_data']
-print('swap_data_query', swap_data_query)
 #using
 token_pairs = [("BUSD", "DAI"),
 
@@ -504,39 +658,49 @@ insert_query = """
     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
 """
 
-# Convert the DataFrame to a list of tuples to use with the SQL query
-
-# Iterate through the token pairs
-for token1, token2 in token_pairs:
-    # Format the query with the current token pair
-    query = query_template % (token1, token2)
-    
-    # Send the request
-    graph_service = GraphService(protocol = 'f-v3', chain='ethereum')
-    result = graph_service.query_thegraph(query)
+def write_swaps(pair, result, source=protocol, table='raw_graph_data_pancakeswap', chain=DEFAULT_CHAIN):
+    # typed columns and indexes, migrating tables created with the old text layout
+    ensure_table('swaps', table)
     result = pd.DataFrame(result)
+    # the subgraph entity id would collide with the table's SERIAL key
+    result = result.drop(columns=['id'], errors='ignore')
     result.columns = result.columns.str.lower()
     # print('result.cols', result.columns)
     # print('result data from graph', result)
-    result['source']='pancakeswap-v3'
-    data_to_insert = [
-    (
-        row['timestamp'], 
-        row['blocknumber'], 
-        row['hash'], 
-        row['logindex'], 
-        row['tokenin']['symbol'], 
-        row['tokenout']['symbol'], 
-        row['amountout'], 
-        row['amountoutusd'], 
-        row['amountin'], 
-        row['amountinusd']
-    )
-    for index, row in result.iterrows()
-]
-    # print('data_to_insert',data_to_insert)
-    
-    data_to_send = DbService.insert_data(result, 'raw_graph_data_pancakeswap', dex_table_structure)
+    result['source']=source
+    result['chain']=chain
+    # re-runs and overlapping shards skip swaps already stored under (hash, logindex)
+    return DbService.upsert_data(result, table, dex_table_structure)
+
+
+if __name__ == "__main__":
+    graph_service = GraphService(protocol=protocol, chain='ethereum')
+    print('after graph_service')
+
+    if SWEEP_SINGLE_STREAM and SWEEP_INCREMENTAL:
+        # one stream for every pair, from its watermark, split by pair locally
+        sync_universe(graph_service, WatermarkStore(), token_pairs, write_swaps)
+    elif SWEEP_SINGLE_STREAM:
+        sweep_universe(graph_service, token_pairs, write_swaps)
+    elif SWEEP_INCREMENTAL:
+        # only fetch swaps newer than each pair's watermark
+        sync_token_pairs(graph_service, WatermarkStore(), token_pairs, write_swaps, concurrency=SWEEP_CONCURRENCY)
+    elif SWEEP_BATCH_SIZE > 1:
+        # pack many pairs into one aliased document per request
+        sweep_pairs_batched(graph_service, token_pairs, 'swaps', swap_fields, write_swaps, batch_size=SWEEP_BATCH_SIZE)
+    elif SWEEP_CONCURRENCY > 1:
+        # page through every pair concurrently and write each result as it arrives
+        summary = sweep_token_pairs(graph_service, token_pairs, GraphService.fetch_pair, write_swaps, concurrency=SWEEP_CONCURRENCY)
+        if summary["failed"]:
+            # one more pass over the pairs that failed, serially
+            sweep_token_pairs(graph_service, summary["failed"], GraphService.fetch_pair, write_swaps, concurrency=1)
+    else:
+        # Iterate through the token pairs
+        for token1, token2 in token_pairs:
+            # Page through all of the pair's swaps
+            result = graph_service.fetch_pair((token1, token2))
+            if result:
+                write_swaps((token1, token2), result)
 
     # response = requests.post(url, json={'query': query})
 
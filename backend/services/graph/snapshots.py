@@ -0,0 +1,67 @@
+import sys
+
+from backend.database.send_data import copy_rows
+from backend.database.stream import transform_stream
+from backend.services.graph.service import DEFAULT_CHAIN, DEFAULT_PROTOCOL, GraphService, query_uniswap_pools
+
+snapshot_table_structure = """id SERIAL PRIMARY KEY,
+    market VARCHAR(255),
+    inputtoken TEXT,
+    outputtoken TEXT,
+    timestamp TIMESTAMPTZ,
+    totalvaluelockedusd NUMERIC,
+    source VARCHAR(255),
+    chain VARCHAR(255)"""
+
+snapshot_fields = """
+id
+blockNumber
+timestamp
+totalValueLockedUSD
+"""
+
+
+def snapshot_pages(graph_service, markets, fields=snapshot_fields):
+    """Yield (market, page) for every page of every market's hourly snapshots."""
+    for market in markets:
+        where = {"market": market["id"]}
+        for page in graph_service.paginate("marketHourlySnapshots", fields, where=where, cursor="blockNumber"):
+            yield market, page
+
+
+def snapshot_rows(market, snapshots, source=DEFAULT_PROTOCOL, chain=DEFAULT_CHAIN):
+    """One row per snapshot, tagged with its market (timestamps come formatted from paginate)."""
+    for snapshot in snapshots:
+        yield {
+            "market": market.get("id"),
+            "inputtoken": (market.get("inputToken") or {}).get("symbol"),
+            "outputtoken": (market.get("outputToken") or {}).get("symbol"),
+            "timestamp": snapshot.get("timestamp"),
+            "totalvaluelockedusd": snapshot.get("totalValueLockedUSD"),
+            "source": source,
+            "chain": chain,
+        }
+
+
+def export_market_snapshots(graph_service, query=query_uniswap_pools, table="raw_graph_data_market_snapshots"):
+    """Page every market's hourly snapshots straight into Postgres.
+
+    The market list is parsed off the response as it streams in
+    (GraphService.stream_records). Snapshots are then walked one page per
+    request with GraphService.paginate and COPYed as they arrive, so one
+    page is in memory at a time, however long a market's history is.
+    """
+    subgraph = graph_service.subgraph
+    # no nested snapshots, so the list is small; read it all before paging
+    markets = list(graph_service.stream_records(query))
+    return transform_stream(
+        snapshot_pages(graph_service, markets),
+        lambda item: snapshot_rows(*item, source=subgraph.protocol, chain=subgraph.chain),
+        lambda records: copy_rows(records, table, snapshot_table_structure),
+    )
+
+
+if __name__ == "__main__":
+    # python -m backend.services.graph.snapshots [protocol]
+    protocol = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PROTOCOL
+    print("snapshots written", export_market_snapshots(GraphService(protocol=protocol, chain=DEFAULT_CHAIN)))
@@ -0,0 +1,86 @@
+import hashlib
+
+import pandas as pd
+
+from backend.services.graph.incremental import sync_stream
+from backend.services.graph.queries import DEFAULT_START_BLOCK, swap_fields
+
+
+def universe_where(token_pairs, pool_ids=None):
+    """One filter covering every pair: the pairs' pools if known, else swaps between universe tokens."""
+    if pool_ids:
+        return {"pool_in": sorted(set(pool_ids))}
+    symbols = sorted({token for pair in token_pairs for token in pair})
+    return {"tokenIn_": {"symbol_in": symbols}, "tokenOut_": {"symbol_in": symbols}}
+
+
+def universe_stream(token_pairs):
+    # a different token list is a different stream with its own watermark
+    digest = hashlib.sha256(",".join(sorted("/".join(pair) for pair in token_pairs)).encode("utf-8"))
+    return f"universe:{digest.hexdigest()[:12]}"
+
+
+def partition_pairs(rows, token_pairs):
+    """Split swap rows into {(tokenIn, tokenOut): rows}, keeping only the requested pairs.
+
+    Rows with a null tokenIn/tokenOut belong to no pair and are dropped.
+    """
+    if not rows:
+        return {}
+    # a page where every tokenIn (or tokenOut) is null has no ".symbol" column at all
+    symbols = pd.json_normalize(rows).reindex(columns=["tokenIn.symbol", "tokenOut.symbol"]).dropna()
+    wanted = set(map(tuple, token_pairs))
+    buckets = {}
+    for pair, positions in symbols.groupby(["tokenIn.symbol", "tokenOut.symbol"], sort=False).indices.items():
+        if pair in wanted:
+            buckets[pair] = [rows[symbols.index[i]] for i in positions]
+    return buckets
+
+
+def plan_pool_ids(pool_index, token_pairs):
+    pool_ids = set()
+    for token1, token2 in token_pairs:
+        pool_ids.update(pool_index.pool_ids(token1, token2))
+    return pool_ids
+
+
+def write_partitioned(token_pairs, write):
+    def write_page(page):
+        for pair, rows in partition_pairs(page, token_pairs).items():
+            write(pair, rows)
+
+    return write_page
+
+
+def sweep_universe(graph_service, token_pairs, write, pool_index=None, entity="swaps", fields=swap_fields, start_block=DEFAULT_START_BLOCK):
+    """Fetch swaps for all pairs with one paginated stream and hand `write(pair, rows)` each pair's share.
+
+    Replaces one filtered scan per ordered pair with a single sequential
+    scan; pairs are split out locally page by page.
+    """
+    pool_ids = plan_pool_ids(pool_index, token_pairs) if pool_index is not None else None
+    where = dict(universe_where(token_pairs, pool_ids), blockNumber_gt=start_block)
+    write_page = write_partitioned(token_pairs, write)
+    rows = 0
+    for page in graph_service.paginate(entity, fields, where=where, cursor="blockNumber"):
+        write_page(page)
+        rows += len(page)
+    print(f"{len(token_pairs)} pairs: {rows} {entity} in one stream")
+    return rows
+
+
+def sync_universe(graph_service, watermarks, token_pairs, write, pool_index=None, entity="swaps", fields=swap_fields, start_block=DEFAULT_START_BLOCK):
+    """sweep_universe, but only for swaps newer than the stream's watermark."""
+    pool_ids = plan_pool_ids(pool_index, token_pairs) if pool_index is not None else None
+    rows = sync_stream(
+        graph_service,
+        watermarks,
+        universe_stream(token_pairs),
+        entity,
+        fields,
+        universe_where(token_pairs, pool_ids),
+        write_partitioned(token_pairs, write),
+        start_block=start_block,
+    )
+    print(f"{len(token_pairs)} pairs: {rows} new {entity} in one stream")
+    return rows
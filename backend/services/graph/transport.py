@@ -0,0 +1,278 @@
+import json
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.config import GRAPH_PERSISTED_QUERIES
+from backend.services.graph.gql import as_document
+from backend.services.graph.ratelimit import get_policy
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:
+    ijson = None
+
+try:
+    # requests/urllib3 only decode brotli bodies when a brotli package is installed
+    import brotli  # noqa: F401
+
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 60
+# number of distinct hosts to keep pools for, and sockets kept alive per host
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 16
+# GraphQL error messages worth retrying; anything else is a problem with the query
+TRANSIENT_GRAPHQL_ERRORS = (
+    "timeout",
+    "timed out",
+    "too many",
+    "rate limit",
+    "overloaded",
+    "unavailable",
+    "bad indexers",
+    "store error",
+)
+
+
+class GraphQLError(ValueError):
+    """A response carrying GraphQL `errors` and no data."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"GraphQL errors: {errors}")
+
+    @property
+    def transient(self):
+        text = json.dumps(self.errors).lower()
+        return any(marker in text for marker in TRANSIENT_GRAPHQL_ERRORS)
+
+
+def persisted_query_status(e):
+    """How a hash-only (persisted) request failed: "miss", "unsupported" or None for a real error."""
+    if isinstance(e, requests.HTTPError):
+        status = e.response.status_code if e.response is not None else None
+        return "unsupported" if status in (400, 404, 405) else None
+    if not isinstance(e, GraphQLError):
+        return None
+    text = json.dumps(e.errors).lower()
+    if "persistedquerynotfound" in text or "persisted query not found" in text:
+        return "miss"
+    if "persisted" in text or "must provide" in text or "no query" in text:
+        return "unsupported"
+    return None
+
+
+def check_graphql_errors(body):
+    if body.get("errors") and not body.get("data"):
+        raise GraphQLError(body["errors"])
+    return body
+
+
+def classify_error(e):
+    """None for permanent errors, else (throttled, retry_after) for ones worth retrying."""
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        status = e.response.status_code
+        if status == 429 or status >= 500:
+            retry_after = e.response.headers.get("Retry-After")
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            return status in (429, 503), retry_after
+        return None
+    if isinstance(e, requests.Timeout):
+        return True, None
+    if isinstance(e, requests.ConnectionError):
+        return False, None
+    if isinstance(e, GraphQLError) and e.transient:
+        return True, None
+    return None
+
+
+class GraphQLTransport:
+    """Keep-alive HTTP transport shared by every GraphService.
+
+    Wraps one requests.Session so connections to api.thegraph.com and the
+    gateway are pooled per host and reused across queries instead of paying
+    a TCP+TLS handshake on every request.
+    """
+
+    def __init__(
+        self,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=DEFAULT_POOL_MAXSIZE,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        # hosts that rejected a hash-only persisted query
+        self.persisted_unsupported = set()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            # block instead of opening throwaway sockets when a host pool is exhausted
+            pool_block=True,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "Accept": "application/json",
+                "Accept-Encoding": ACCEPT_ENCODING,
+                "Connection": "keep-alive",
+                "Content-Type": "application/json",
+            }
+        )
+
+    def send(self, url, payload, headers=None, timeout=None, stream=False):
+        r = self.session.post(
+            url, json=payload, headers=headers, timeout=timeout or self.timeout, stream=stream
+        )
+        r.raise_for_status()
+        return r
+
+    def call(self, url, send):
+        # retries, rate limits and circuit breaking are shared per endpoint host
+        return get_policy(urlparse(url).netloc).call(send, classify_error)
+
+    def post(self, url, payload, headers=None, timeout=None, stream=False):
+        return self.call(url, lambda: self.send(url, payload, headers, timeout, stream))
+
+    def post_json(self, url, payload, headers=None, timeout=None):
+        """POST and decode the body exactly once (orjson when installed).
+
+        A body with GraphQL `errors` and no data raises GraphQLError; transient
+        ones (timeouts, overloaded indexers) are retried like a 429.
+        """
+        return self.call(
+            url,
+            lambda: check_graphql_errors(loads(self.send(url, payload, headers, timeout).content)),
+        )
+
+    def post_document(self, url, query, variables=None, headers=None, timeout=None):
+        """POST a query (text or QueryDocument) with its variables and return the decoded body.
+
+        Catalog documents are first sent as their sha256 only (automatic
+        persisted queries). On a cache miss the text is sent along once so
+        the server registers it. Endpoints that do not support persisted
+        queries are remembered and get the plain text from then on.
+        """
+        document = as_document(query)
+        host = urlparse(url).netloc
+        if GRAPH_PERSISTED_QUERIES and document.name and host not in self.persisted_unsupported:
+            try:
+                return self.post_json(
+                    url, document.payload(variables, persisted=True, include_text=False), headers, timeout
+                )
+            except (GraphQLError, requests.HTTPError) as e:
+                status = persisted_query_status(e)
+                if status is None:
+                    raise
+                if status == "miss":
+                    return self.post_json(url, document.payload(variables, persisted=True), headers, timeout)
+                self.persisted_unsupported.add(host)
+        return self.post_json(url, document.payload(variables), headers, timeout)
+
+    def stream_records(self, url, payload, headers=None, timeout=None):
+        """POST and yield the rows of the first `data.<entity>` array while the body downloads.
+
+        Needs ijson; without it the body is decoded once and iterated.
+        """
+        r = self.post(url, payload, headers=headers, timeout=timeout, stream=ijson is not None)
+        with r:
+            if ijson is None:
+                yield from first_table_records(loads(r.content))
+                return
+            # r.raw undoes gzip/brotli only when asked to
+            r.raw.decode_content = True
+            yield from iter_records(r.raw)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def first_table_records(body):
+    data = body.get("data")
+    if not data:
+        raise ValueError(f"no data in GraphQL response: {body.get('errors')}")
+    rows = data[list(data.keys())[0]]
+    if rows is None:
+        return []
+    return rows if isinstance(rows, list) else [rows]
+
+
+def iter_records(fileobj):
+    """Incrementally parse a GraphQL response, yielding rows of its first data entity.
+
+    Only one row is materialized at a time, so memory stays flat however
+    large the array is.
+    """
+    entity_prefix = None
+    item_prefix = None
+    builder = None
+    builder_prefix = None
+    errors = None
+    found = False
+    for prefix, event, value in ijson.parse(fileobj, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == builder_prefix and event in ("end_map", "end_array"):
+                if builder_prefix == "errors":
+                    errors = builder.value
+                else:
+                    yield builder.value
+                builder = None
+            continue
+        if prefix == "data" and event == "map_key" and entity_prefix is None:
+            entity_prefix = f"data.{value}"
+            item_prefix = f"{entity_prefix}.item"
+        elif entity_prefix is not None and prefix == entity_prefix:
+            found = True
+            if event == "start_map":
+                # a single entity rather than a collection
+                builder, builder_prefix = ObjectBuilder(), entity_prefix
+                builder.event(event, value)
+        elif item_prefix is not None and prefix == item_prefix:
+            if event in ("start_map", "start_array"):
+                builder, builder_prefix = ObjectBuilder(), item_prefix
+                builder.event(event, value)
+            else:
+                yield value
+        elif prefix == "errors" and event == "start_array":
+            builder, builder_prefix = ObjectBuilder(), "errors"
+            builder.event(event, value)
+    if not found:
+        raise ValueError(f"no data in GraphQL response: {errors}")
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = GraphQLTransport()
+        return _default_transport
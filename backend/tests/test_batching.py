@@ -0,0 +1,26 @@
+from backend.services.graph.batching import build_pair_batch, query_pairs_batched, swap_pair_where
+
+
+class FakeGraphService:
+    def __init__(self, rows_by_pair):
+        self.rows_by_pair = rows_by_pair
+        self.paginated = []
+
+    def query_thegraph_tables(self, query):
+        _, aliases = build_pair_batch(list(self.rows_by_pair), "swaps", "id", swap_pair_where, first=2)
+        return {alias: self.rows_by_pair[pair][:2] for alias, pair in aliases.items()}
+
+    def paginate(self, entity, fields, where=None, cursor="id"):
+        pair = tuple(clause[key]["symbol"] for clause, key in zip(where["and"], ("tokenIn_", "tokenOut_")))
+        self.paginated.append(pair)
+        rows = self.rows_by_pair[pair]
+        yield rows[:2]
+        yield rows[2:]
+
+
+def test_pair_at_the_row_limit_is_paged_in_full():
+    rows_by_pair = {("DAI", "USDC"): [{"id": str(i)} for i in range(5)], ("DAI", "WETH"): [{"id": "a"}]}
+    graph_service = FakeGraphService(rows_by_pair)
+    result = dict(query_pairs_batched(graph_service, rows_by_pair, "swaps", "id", first=2))
+    assert result == rows_by_pair
+    assert graph_service.paginated == [("DAI", "USDC")]
@@ -0,0 +1,22 @@
+from backend.services.graph.fanout import sweep_token_pairs
+
+
+def fetch(graph_service, pair):
+    if pair == ("BAD", "USDC"):
+        raise RuntimeError("boom")
+    return [] if pair == ("DAI", "WETH") else [{"pair": pair}]
+
+
+def test_failed_pairs_are_returned():
+    written = []
+
+    def write(pair, result):
+        if pair == ("DAI", "BAD"):
+            raise RuntimeError("disk full")
+        written.append(pair)
+
+    pairs = [("DAI", "USDC"), ("BAD", "USDC"), ("DAI", "WETH"), ("DAI", "BAD")]
+    summary = sweep_token_pairs(None, pairs, fetch, write, concurrency=2)
+    assert written == [("DAI", "USDC")]
+    assert summary["items"] == 1
+    assert sorted(summary["failed"]) == [("BAD", "USDC"), ("DAI", "BAD")]
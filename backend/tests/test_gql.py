@@ -0,0 +1,21 @@
+from backend.services.graph.gql import top_level_fields
+from backend.services.graph.queries import swap_fields
+
+
+def test_nested_id_is_not_a_top_level_field():
+    fields = """
+    blockNumber
+    pool(where: { id: "0x1" }) {
+      id
+    }
+    tokenIn { id symbol }
+    """
+    assert top_level_fields(fields) == {"blockNumber", "pool", "tokenIn"}
+
+
+def test_alias_is_the_response_key():
+    assert top_level_fields("cursor: id\nhash") == {"cursor", "hash"}
+
+
+def test_swap_fields_select_the_block_cursor():
+    assert {"id", "blockNumber"} <= top_level_fields(swap_fields)
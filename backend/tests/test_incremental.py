@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+from backend.database.watermarks import Watermark
+from backend.services.graph.incremental import sync_stream
+
+
+class FakeWatermarks:
+    def __init__(self, mark=None):
+        self.mark = mark
+
+    def get(self, protocol, chain, stream, entity):
+        return self.mark
+
+    def advance(self, protocol, chain, stream, entity, block_number):
+        if self.mark is None or block_number > self.mark.block_number or self.mark.log_index is not None:
+            self.mark = Watermark(block_number, None, None)
+        return self.mark
+
+
+class FakeGraphService:
+    """Serves `rows` sorted by (blockNumber, id) in pages of `page_size`, honouring the block filter."""
+
+    def __init__(self, rows, page_size=2):
+        self.subgraph = SimpleNamespace(protocol="uniswap-v3", chain="ethereum")
+        self.rows = sorted(rows, key=lambda r: (int(r["blockNumber"]), r["id"]))
+        self.page_size = page_size
+
+    def paginate(self, entity, fields, where=None, cursor="id"):
+        rows = self.rows
+        if "blockNumber_gt" in where:
+            rows = [r for r in rows if int(r["blockNumber"]) > where["blockNumber_gt"]]
+        if "blockNumber_gte" in where:
+            rows = [r for r in rows if int(r["blockNumber"]) >= where["blockNumber_gte"]]
+        for i in range(0, len(rows), self.page_size):
+            yield rows[i:i + self.page_size]
+
+
+def swap(id, block, log_index):
+    return {"id": id, "blockNumber": str(block), "hash": id[:4], "logIndex": log_index}
+
+
+# ids (hash + logIndex) sort differently from logIndex inside block 101
+ROWS = [
+    swap("0xaa-7", 101, 7),
+    swap("0xbb-9", 101, 9),
+    swap("0xcc-2", 101, 2),
+    swap("0xdd-5", 101, 5),
+    swap("0xee-1", 102, 1),
+]
+
+
+def run(graph_service, watermarks, fail_after=None):
+    written = []
+
+    def write(page):
+        if fail_after is not None and len(written) >= fail_after:
+            raise RuntimeError("crash")
+        written.extend(row["id"] for row in page)
+
+    try:
+        sync_stream(graph_service, watermarks, "A/B", "swaps", "id", {}, write, start_block=100)
+    except RuntimeError:
+        pass
+    return written
+
+
+def test_block_split_across_pages_is_written_whole():
+    watermarks = FakeWatermarks()
+    written = run(FakeGraphService(ROWS), watermarks)
+    assert sorted(written) == sorted(r["id"] for r in ROWS)
+    assert watermarks.mark == Watermark(102, None, None)
+
+
+def test_crash_inside_block_resumes_from_last_complete_block():
+    watermarks = FakeWatermarks()
+    graph_service = FakeGraphService(ROWS)
+    first = run(graph_service, watermarks, fail_after=2)
+    # block 101 was only half written, so it is not recorded as done
+    assert watermarks.mark is None
+    second = run(graph_service, watermarks)
+    assert set(first + second) == {r["id"] for r in ROWS}
+    assert watermarks.mark == Watermark(102, None, None)
+
+
+def test_nothing_new_leaves_watermark_alone():
+    watermarks = FakeWatermarks(Watermark(102, None, None))
+    assert run(FakeGraphService(ROWS), watermarks) == []
+    assert watermarks.mark == Watermark(102, None, None)
@@ -0,0 +1,53 @@
+from backend.services.graph import ratelimit
+from backend.services.graph.ratelimit import CircuitBreaker, EndpointPolicy
+
+
+class Throttled(Exception):
+    pass
+
+
+class Down(Exception):
+    pass
+
+
+def classify(e):
+    return (isinstance(e, Throttled), None)
+
+
+def no_sleep(monkeypatch):
+    slept = []
+    monkeypatch.setattr(ratelimit.time, "sleep", slept.append)
+    return slept
+
+
+def responses(*outcomes):
+    outcomes = list(outcomes)
+
+    def send():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return send
+
+
+def test_throttling_does_not_open_the_circuit(monkeypatch):
+    no_sleep(monkeypatch)
+    policy = EndpointPolicy("test", rate=1000)
+    send = responses(*[Throttled("429")] * 5, "ok")
+    assert policy.call(send, classify) == "ok"
+    assert policy.breaker.state == "closed"
+
+
+def test_open_circuit_is_waited_out_and_probed(monkeypatch):
+    slept = []
+    policy = EndpointPolicy("test", rate=1000)
+    policy.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    now = [0.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda s: (slept.append(s), now.__setitem__(0, now[0] + s)))
+    send = responses(Down("502"), "ok")
+    assert policy.call(send, classify) == "ok"
+    assert max(slept) >= 30
+    assert policy.breaker.state == "closed"
@@ -0,0 +1,42 @@
+import json
+import os
+
+from backend.services.graph import registry
+from backend.services.graph.registry import load_registry, snapshot_path
+
+DEPLOYMENTS = {
+    "uniswap-v3": {
+        "base": "uniswap-v3-forks",
+        "deployments": {
+            "uniswap-v3-ethereum": {
+                "services": {"hosted-service": {"query-id": "uniswap-v3-ethereum"}},
+                "files": {"template": "uniswap.v3.template.yaml"},
+            }
+        },
+    }
+}
+
+
+def write_deployments(path, deployments):
+    with open(path, "w") as f:
+        json.dump(deployments, f)
+
+
+def test_snapshot_is_reused_until_deployment_file_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "deployment.json")
+    snapshots = str(tmp_path / "snapshots")
+    write_deployments(path, DEPLOYMENTS)
+    first = load_registry(path, snapshots)
+    assert os.path.exists(snapshot_path(path, snapshots))
+
+    parsed = []
+    monkeypatch.setattr(registry.DeploymentRegistry, "__init__", lambda self, p: parsed.append(p))
+    again = load_registry(path, snapshots)
+    assert parsed == []
+    assert again.get("uniswap-v3", "ethereum") == first.get("uniswap-v3", "ethereum")
+
+    monkeypatch.undo()
+    write_deployments(path, {})
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert load_registry(path, snapshots).entries == {}
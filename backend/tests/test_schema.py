@@ -0,0 +1,49 @@
+from backend.database.schema import typed_swap_columns
+
+
+class FakeCursor:
+    def __init__(self, columns):
+        self.columns = columns
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return list(self.columns.items())
+
+
+LEGACY = {
+    "timestamp": "character varying",
+    "blocknumber": "text",
+    "logindex": "character varying",
+    "amountout": "character varying",
+    "amountoutusd": "character varying",
+    "amountin": "character varying",
+    "amountinusd": "character varying",
+}
+
+
+def test_legacy_columns_are_converted():
+    [statement] = typed_swap_columns("raw", FakeCursor(LEGACY))
+    assert statement.count("ALTER COLUMN") == 7
+
+
+def test_already_typed_columns_are_skipped():
+    columns = dict(LEGACY, timestamp="timestamp with time zone", amountin="numeric")
+    [statement] = typed_swap_columns("raw", FakeCursor(columns))
+    assert "ALTER COLUMN timestamp" not in statement
+    assert "ALTER COLUMN amountin " not in statement
+    assert statement.count("ALTER COLUMN") == 5
+
+
+def test_typed_table_needs_no_migration():
+    columns = {
+        "timestamp": "timestamp with time zone",
+        "blocknumber": "bigint",
+        "logindex": "integer",
+        "amountout": "numeric",
+        "amountoutusd": "numeric",
+        "amountin": "numeric",
+        "amountinusd": "numeric",
+    }
+    assert typed_swap_columns("raw", FakeCursor(columns)) == []
@@ -0,0 +1,20 @@
+from backend.services.graph.swap_stream import partition_pairs
+
+
+def swap(token_in, token_out):
+    return {
+        "tokenIn": None if token_in is None else {"symbol": token_in},
+        "tokenOut": None if token_out is None else {"symbol": token_out},
+    }
+
+
+def test_rows_are_split_into_requested_pairs():
+    rows = [swap("DAI", "USDC"), swap("USDC", "DAI"), swap("DAI", "USDC"), swap("WETH", "DAI")]
+    buckets = partition_pairs(rows, [("DAI", "USDC"), ("USDC", "DAI")])
+    assert buckets == {("DAI", "USDC"): [rows[0], rows[2]], ("USDC", "DAI"): [rows[1]]}
+
+
+def test_rows_with_null_tokens_are_dropped():
+    rows = [swap(None, "USDC"), swap("DAI", None), swap("DAI", "USDC")]
+    assert partition_pairs(rows, [("DAI", "USDC")]) == {("DAI", "USDC"): [rows[2]]}
+    assert partition_pairs(rows[:2], [("DAI", "USDC")]) == {}